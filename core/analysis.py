@@ -6,10 +6,11 @@ Each generator yields dicts of the form:
 where signal is one of: "bullish", "bearish", "neutral", "info", or None.
 """
 
-import ta
-from core.data_fetcher import fetch_stock_data, fetch_stock_info, fetch_stock_financials
+import numpy as np
+
+from core.data_fetcher import fetch_stock_data, fetch_stock_info, fetch_stock_financials, fetch_index_data
+from core.indicators import get_indicators
 from core.markets import get_market_config
-from core import cache
 
 
 def _fmt(value, prefix="", suffix="", decimals=2):
@@ -33,6 +34,9 @@ def technical_analysis(symbol: str, market: str = "IN"):
     config = get_market_config(market)
     cur = config["currency"]
     df = fetch_stock_data(symbol, market=market)
+    ind = get_indicators(symbol, market=market)
+    latest = ind.iloc[-1]
+    previous = ind.iloc[-2]
     close = df["Close"]
     high = df["High"]
     low = df["Low"]
@@ -59,14 +63,14 @@ def technical_analysis(symbol: str, market: str = "IN"):
     }
 
     # --- Moving Averages ---
-    sma_20 = ta.trend.sma_indicator(close, window=20).iloc[-1]
-    sma_50 = ta.trend.sma_indicator(close, window=50).iloc[-1]
-    sma_200 = ta.trend.sma_indicator(close, window=200).iloc[-1]
-    ema_12 = ta.trend.ema_indicator(close, window=12).iloc[-1]
-    ema_26 = ta.trend.ema_indicator(close, window=26).iloc[-1]
-
-    sma_50_prev = ta.trend.sma_indicator(close, window=50).iloc[-2]
-    sma_200_prev = ta.trend.sma_indicator(close, window=200).iloc[-2]
+    sma_20 = latest["sma_20"]
+    sma_50 = latest["sma_50"]
+    sma_200 = latest["sma_200"]
+    ema_12 = latest["ema_12"]
+    ema_26 = latest["ema_26"]
+
+    sma_50_prev = previous["sma_50"]
+    sma_200_prev = previous["sma_200"]
     if sma_50_prev <= sma_200_prev and sma_50 > sma_200:
         cross_signal = "GOLDEN CROSS"
         cross_s = "bullish"
@@ -101,7 +105,7 @@ def technical_analysis(symbol: str, market: str = "IN"):
     }
 
     # --- Momentum ---
-    rsi = ta.momentum.rsi(close, window=14).iloc[-1]
+    rsi = latest["rsi_14"]
     if rsi > 70:
         rsi_signal, rsi_s = "Overbought", "bearish"
     elif rsi < 30:
@@ -116,8 +120,8 @@ def technical_analysis(symbol: str, market: str = "IN"):
     else:
         bearish += 1
 
-    stoch_k = ta.momentum.stoch(high, low, close, window=14, smooth_window=3).iloc[-1]
-    stoch_d = ta.momentum.stoch_signal(high, low, close, window=14, smooth_window=3).iloc[-1]
+    stoch_k = latest["stoch_k"]
+    stoch_d = latest["stoch_d"]
     if stoch_k > 80:
         stoch_sig, stoch_s = "Overbought", "bearish"
         bearish += 1
@@ -128,9 +132,9 @@ def technical_analysis(symbol: str, market: str = "IN"):
         stoch_sig, stoch_s = "Neutral", "neutral"
         bullish += 1
 
-    macd_line = ta.trend.macd(close).iloc[-1]
-    macd_signal_line = ta.trend.macd_signal(close).iloc[-1]
-    macd_hist = ta.trend.macd_diff(close).iloc[-1]
+    macd_line = latest["macd"]
+    macd_signal_line = latest["macd_signal"]
+    macd_hist = latest["macd_hist"]
     macd_trend = "Bullish" if macd_hist > 0 else "Bearish"
     macd_s = "bullish" if macd_hist > 0 else "bearish"
     if macd_hist > 0:
@@ -151,7 +155,7 @@ def technical_analysis(symbol: str, market: str = "IN"):
     }
 
     # --- Trend Strength ---
-    adx = ta.trend.adx(high, low, close, window=14).iloc[-1]
+    adx = latest["adx_14"]
     adx_signal = "Strong Trend" if adx > 25 else "Weak/No Trend"
 
     yield {
@@ -163,12 +167,12 @@ def technical_analysis(symbol: str, market: str = "IN"):
     }
 
     # --- Volatility ---
-    atr = ta.volatility.average_true_range(high, low, close, window=14).iloc[-1]
+    atr = latest["atr_14"]
     atr_pct = (atr / latest_price) * 100
 
-    bb_high = ta.volatility.bollinger_hband(close).iloc[-1]
-    bb_low = ta.volatility.bollinger_lband(close).iloc[-1]
-    bb_mid = ta.volatility.bollinger_mavg(close).iloc[-1]
+    bb_high = latest["bb_high"]
+    bb_low = latest["bb_low"]
+    bb_mid = latest["bb_mid"]
     bb_width = ((bb_high - bb_low) / bb_mid) * 100
 
     if latest_price >= bb_high:
@@ -199,13 +203,12 @@ def technical_analysis(symbol: str, market: str = "IN"):
     }
 
     # --- Volume ---
-    avg_volume_20 = volume.rolling(window=20).mean().iloc[-1]
+    avg_volume_20 = latest["volume_sma_20"]
     current_volume = volume.iloc[-1]
     vol_ratio = current_volume / avg_volume_20 if avg_volume_20 > 0 else 0
 
-    obv = ta.volume.on_balance_volume(close, volume)
-    obv_current = obv.iloc[-1]
-    obv_5_ago = obv.iloc[-5]
+    obv_current = latest["obv"]
+    obv_5_ago = ind["obv"].iloc[-5]
     obv_trend = "Rising" if obv_current > obv_5_ago else "Falling"
     obv_s = "bullish" if obv_current > obv_5_ago else "bearish"
 
@@ -506,37 +509,16 @@ def fundamental_analysis(symbol: str, market: str = "IN"):
     }
 
 
-def _safe_get_row(df, label):
-    """Try multiple common row-label variants to find a value in a financial statement DataFrame."""
-    variants = {
-        "Net Income": ["Net Income", "Net Income Common Stockholders", "Net Income From Continuing Operations"],
-        "Total Assets": ["Total Assets"],
-        "Total Revenue": ["Total Revenue", "Operating Revenue"],
-        "Cost Of Revenue": ["Cost Of Revenue", "Cost Of Goods Sold"],
-        "Gross Profit": ["Gross Profit"],
-        "Operating Cash Flow": ["Operating Cash Flow", "Total Cash From Operating Activities", "Cash Flow From Continuing Operating Activities"],
-        "Long Term Debt": ["Long Term Debt", "Long Term Debt And Capital Lease Obligation"],
-        "Current Assets": ["Current Assets", "Total Current Assets"],
-        "Current Liabilities": ["Current Liabilities", "Total Current Liabilities"],
-        "Ordinary Shares Number": ["Ordinary Shares Number", "Share Issued"],
-    }
-    keys = variants.get(label, [label])
-    for key in keys:
-        if key in df.index:
-            return df.loc[key]
-    return None
-
-
 def piotroski_fscore(symbol: str, market: str = "IN"):
     """Yield Piotroski F-Score analysis sections one at a time."""
     config = get_market_config(market)
     cur = config["currency"]
-    ticker = fetch_stock_financials(symbol, market=market)
-    info = ticker.info
+    bundle = fetch_stock_financials(symbol, market=market)
+    info = bundle.info
 
-    financials = ticker.financials  # annual income statement
-    balance = ticker.balance_sheet  # annual balance sheet
-    cashflow = ticker.cashflow  # annual cash flow
+    financials = bundle.financials  # annual income statement
+    balance = bundle.balance_sheet  # annual balance sheet
+    cashflow = bundle.cashflow  # annual cash flow
 
     if financials.empty or balance.empty or cashflow.empty:
         yield {
@@ -547,56 +529,16 @@ def piotroski_fscore(symbol: str, market: str = "IN"):
         return
 
     # We need at least 2 years of data for YoY comparisons
-    # Columns are dates, most recent first
-    has_prior = financials.shape[1] >= 2 and balance.shape[1] >= 2
-
-    # Current year (most recent annual column)
-    curr_fin = financials.iloc[:, 0]
-    curr_bal = balance.iloc[:, 0]
-    curr_cf = cashflow.iloc[:, 0]
-
-    # Prior year
-    if has_prior:
-        prev_fin = financials.iloc[:, 1]
-        prev_bal = balance.iloc[:, 1]
-
-    # Helper to safely get a value
-    def val(series, label):
-        row = _safe_get_row(series.to_frame().T if hasattr(series, 'to_frame') else series, label)
-        if row is not None:
-            v = row.iloc[0] if hasattr(row, 'iloc') else row
-            try:
-                return float(v)
-            except (TypeError, ValueError):
-                return None
-        # Direct index access fallback
-        variants_map = {
-            "Net Income": ["Net Income", "Net Income Common Stockholders"],
-            "Total Assets": ["Total Assets"],
-            "Total Revenue": ["Total Revenue", "Operating Revenue"],
-            "Cost Of Revenue": ["Cost Of Revenue"],
-            "Gross Profit": ["Gross Profit"],
-            "Operating Cash Flow": ["Operating Cash Flow", "Total Cash From Operating Activities", "Cash Flow From Continuing Operating Activities"],
-            "Long Term Debt": ["Long Term Debt", "Long Term Debt And Capital Lease Obligation"],
-            "Current Assets": ["Current Assets"],
-            "Current Liabilities": ["Current Liabilities"],
-            "Ordinary Shares Number": ["Ordinary Shares Number", "Share Issued"],
-        }
-        for key in variants_map.get(label, [label]):
-            if key in series.index:
-                try:
-                    return float(series[key])
-                except (TypeError, ValueError):
-                    pass
-        return None
+    # Periods are ordered most recent first: 0 = current year, 1 = prior year
+    has_prior = financials.n_periods >= 2 and balance.n_periods >= 2
 
     score = 0
 
     # --- Profitability (4 points) ---
-    net_income = val(curr_fin, "Net Income")
-    total_assets = val(curr_bal, "Total Assets")
-    prev_total_assets = val(prev_bal, "Total Assets") if has_prior else None
-    ocf = val(curr_cf, "Operating Cash Flow")
+    net_income = financials.get("Net Income")
+    total_assets = balance.get("Total Assets")
+    prev_total_assets = balance.get("Total Assets", 1) if has_prior else None
+    ocf = cashflow.get("Operating Cash Flow")
 
     # 1. Net Income > 0
     ni_positive = net_income is not None and net_income > 0
@@ -636,18 +578,18 @@ def piotroski_fscore(symbol: str, market: str = "IN"):
     }
 
     # --- Leverage, Liquidity & Source of Funds (3 points) ---
-    curr_lt_debt = val(curr_bal, "Long Term Debt")
-    prev_lt_debt = val(prev_bal, "Long Term Debt") if has_prior else None
+    curr_lt_debt = balance.get("Long Term Debt")
+    prev_lt_debt = balance.get("Long Term Debt", 1) if has_prior else None
 
-    curr_current_assets = val(curr_bal, "Current Assets")
-    curr_current_liab = val(curr_bal, "Current Liabilities")
-    prev_current_assets = val(prev_bal, "Current Assets") if has_prior else None
-    prev_current_liab = val(prev_bal, "Current Liabilities") if has_prior else None
+    curr_current_assets = balance.get("Current Assets")
+    curr_current_liab = balance.get("Current Liabilities")
+    prev_current_assets = balance.get("Current Assets", 1) if has_prior else None
+    prev_current_liab = balance.get("Current Liabilities", 1) if has_prior else None
 
     curr_shares = info.get("sharesOutstanding")
     # We can't easily get prior shares from yfinance info, so use balance sheet
-    prev_shares_val = val(prev_bal, "Ordinary Shares Number") if has_prior else None
-    curr_shares_val = val(curr_bal, "Ordinary Shares Number")
+    prev_shares_val = balance.get("Ordinary Shares Number", 1) if has_prior else None
+    curr_shares_val = balance.get("Ordinary Shares Number")
 
     # 5. Lower long-term debt ratio YoY
     if curr_lt_debt is not None and prev_lt_debt is not None and total_assets and prev_total_assets:
@@ -705,10 +647,10 @@ def piotroski_fscore(symbol: str, market: str = "IN"):
     }
 
     # --- Operating Efficiency (2 points) ---
-    curr_revenue = val(curr_fin, "Total Revenue")
-    prev_revenue = val(prev_fin, "Total Revenue") if has_prior else None
-    curr_gross = val(curr_fin, "Gross Profit")
-    prev_gross = val(prev_fin, "Gross Profit") if has_prior else None
+    curr_revenue = financials.get("Total Revenue")
+    prev_revenue = financials.get("Total Revenue", 1) if has_prior else None
+    curr_gross = financials.get("Gross Profit")
+    prev_gross = financials.get("Gross Profit", 1) if has_prior else None
 
     # 8. Higher gross margin YoY
     curr_gm = curr_gross / curr_revenue if curr_gross is not None and curr_revenue and curr_revenue != 0 else None
@@ -771,48 +713,37 @@ def canslim_analysis(symbol: str, market: str = "IN"):
     """Yield CAN SLIM analysis sections one at a time."""
     config = get_market_config(market)
     cur = config["currency"]
-    ticker = fetch_stock_financials(symbol, market=market)
-    info = ticker.info
+    bundle = fetch_stock_financials(symbol, market=market)
+    info = bundle.info
     df = fetch_stock_data(symbol, market=market)
+    ind = get_indicators(symbol, market=market)
 
     close = df["Close"]
     high = df["High"]
     volume = df["Volume"]
     latest_price = close.iloc[-1]
 
-    quarterly_fin = ticker.quarterly_financials
-    annual_fin = ticker.financials
+    quarterly_fin = bundle.quarterly_financials
+    annual_fin = bundle.financials
 
     # --- C: Current Quarterly Earnings ---
     c_score = False
     c_rows = []
-    if not quarterly_fin.empty and quarterly_fin.shape[1] >= 2:
-        q_ni_curr = None
-        q_ni_prev = None
-        for label in ["Net Income", "Net Income Common Stockholders", "Net Income From Continuing Operations"]:
-            if label in quarterly_fin.index:
-                q_ni_curr = quarterly_fin.iloc[:, 0].get(label)
-                # YoY comparison: compare with same quarter last year (4 quarters ago) if available, else prior quarter
-                if quarterly_fin.shape[1] >= 5:
-                    q_ni_prev = quarterly_fin.iloc[:, 4].get(label)
-                else:
-                    q_ni_prev = quarterly_fin.iloc[:, 1].get(label)
-                break
+    if not quarterly_fin.empty and quarterly_fin.n_periods >= 2:
+        q_ni_curr = quarterly_fin.get("Net Income")
+        # YoY comparison: compare with same quarter last year (4 quarters ago) if available, else prior quarter
+        q_ni_prev = quarterly_fin.get("Net Income", 4 if quarterly_fin.n_periods >= 5 else 1)
 
         if q_ni_curr is not None and q_ni_prev is not None:
-            try:
-                q_ni_curr, q_ni_prev = float(q_ni_curr), float(q_ni_prev)
-                if q_ni_prev > 0:
-                    eps_growth = (q_ni_curr - q_ni_prev) / q_ni_prev
-                    c_score = eps_growth > 0.25
-                    c_rows.append({"label": "Quarterly EPS Growth", "value": f"{eps_growth:.1%}",
-                                   "signal": "bullish" if c_score else ("neutral" if eps_growth > 0 else "bearish")})
-                else:
-                    c_score = q_ni_curr > 0
-                    c_rows.append({"label": "Quarterly EPS", "value": "Turnaround" if c_score else "Negative",
-                                   "signal": "bullish" if c_score else "bearish"})
-            except (TypeError, ValueError):
-                c_rows.append({"label": "Quarterly EPS Growth", "value": "N/A", "signal": None})
+            if q_ni_prev > 0:
+                eps_growth = (q_ni_curr - q_ni_prev) / q_ni_prev
+                c_score = eps_growth > 0.25
+                c_rows.append({"label": "Quarterly EPS Growth", "value": f"{eps_growth:.1%}",
+                               "signal": "bullish" if c_score else ("neutral" if eps_growth > 0 else "bearish")})
+            else:
+                c_score = q_ni_curr > 0
+                c_rows.append({"label": "Quarterly EPS", "value": "Turnaround" if c_score else "Negative",
+                               "signal": "bullish" if c_score else "bearish"})
         else:
             c_rows.append({"label": "Quarterly EPS Growth", "value": "N/A", "signal": None})
     else:
@@ -825,20 +756,17 @@ def canslim_analysis(symbol: str, market: str = "IN"):
     # --- A: Annual Earnings Growth ---
     a_score = False
     a_rows = []
-    if not annual_fin.empty and annual_fin.shape[1] >= 2:
-        ann_ni = []
-        for col_idx in range(min(annual_fin.shape[1], 5)):
-            for label in ["Net Income", "Net Income Common Stockholders"]:
-                if label in annual_fin.index:
-                    try:
-                        ann_ni.append(float(annual_fin.iloc[:, col_idx][label]))
-                    except (TypeError, ValueError):
-                        pass
-                    break
+    if not annual_fin.empty and annual_fin.n_periods >= 2:
+        # Up to 5 years of net income, most recent first. Years without a
+        # value stay in as NaN, so they still count toward the growth span.
+        ann_ni = annual_fin.row("Net Income")[:5]
+        if not np.isfinite(ann_ni).any():
+            # No net income line at all
+            ann_ni = ann_ni[:0]
 
         if len(ann_ni) >= 2:
             # Check if earnings have been growing consistently
-            growing = all(ann_ni[i] > ann_ni[i + 1] for i in range(len(ann_ni) - 1))
+            growing = bool(np.all(ann_ni[:-1] > ann_ni[1:]))
             if ann_ni[-1] > 0:
                 total_growth = (ann_ni[0] - ann_ni[-1]) / ann_ni[-1]
                 cagr = (ann_ni[0] / ann_ni[-1]) ** (1 / len(ann_ni)) - 1 if ann_ni[-1] > 0 else 0
@@ -879,7 +807,7 @@ def canslim_analysis(symbol: str, market: str = "IN"):
 
     # --- S: Supply & Demand ---
     shares_outstanding = info.get("sharesOutstanding")
-    avg_vol_20 = volume.rolling(window=20).mean().iloc[-1]
+    avg_vol_20 = ind["volume_sma_20"].iloc[-1]
     current_vol = volume.iloc[-1]
     vol_ratio = current_vol / avg_vol_20 if avg_vol_20 > 0 else 0
 
@@ -900,7 +828,7 @@ def canslim_analysis(symbol: str, market: str = "IN"):
     yield {"section": "S — Supply & Demand", "rows": s_rows}
 
     # --- L: Leader or Laggard ---
-    rsi = ta.momentum.rsi(close, window=14).iloc[-1]
+    rsi = ind["rsi_14"].iloc[-1]
     week52_low = close.min()
     range_position = ((latest_price - week52_low) / (week52_high - week52_low) * 100) if week52_high != week52_low else 50
     l_score = rsi >= 50 and range_position >= 60  # relative strength
@@ -932,18 +860,10 @@ def canslim_analysis(symbol: str, market: str = "IN"):
 
     # --- M: Market Direction ---
     # Use market index as proxy (Nifty 50 for IN, S&P 500 for US)
-    import yfinance as yf
     index_symbol = config["index"]
     index_label = "Nifty 50" if market.upper() == "IN" else "S&P 500"
     try:
-        cached_index = cache.get("index_data", index_symbol, market, period="6mo")
-        if cached_index is not None:
-            index_df = cached_index
-        else:
-            index_ticker = yf.Ticker(index_symbol)
-            index_df = index_ticker.history(period="6mo")
-            if not index_df.empty:
-                cache.set("index_data", index_symbol, market, index_df, period="6mo")
+        index_df = fetch_index_data(index_symbol, market=market, period="6mo")
         if not index_df.empty:
             index_close = index_df["Close"]
             index_sma50 = index_close.rolling(window=50).mean().iloc[-1]
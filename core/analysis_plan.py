@@ -0,0 +1,198 @@
+"""Which data sources and analyses a requested subset of /api/analyze needs.
+
+The analyze API builds its output from four categories (the generators in
+core.analysis). Each category lists the data sources it reads and the
+sections it yields, and a source may depend on another one (the financials
+bundle includes the info dict). plan() walks this graph from the requested
+categories and/or sections. Only the sources and categories that are
+actually needed then run, so a technicals-only request never touches
+financial statements.
+
+A category runs as a whole, since its summary section is derived from all
+of its other sections. Selecting sections narrows the output and skips
+the categories that don't produce any of them.
+"""
+
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Callable
+
+from core.analysis import canslim_analysis, fundamental_analysis, piotroski_fscore, technical_analysis
+from core.data_fetcher import (fetch_index_data, fetch_stock_data, fetch_stock_financials,
+                               fetch_stock_info, freshness)
+from core.markets import get_market_config
+
+
+@dataclass(frozen=True)
+class Source:
+    fetch: Callable[[str, str], object]
+    freshness: Callable[[str, str], dict]
+    requires: tuple[str, ...] = ()
+    # Without this source nothing useful can be shown, so the request fails up front
+    essential: bool = False
+
+
+@dataclass(frozen=True)
+class Category:
+    analyze: Callable
+    sources: tuple[str, ...]
+    sections: tuple[str, ...]
+
+
+SOURCES: dict[str, Source] = {
+    "prices": Source(
+        fetch=lambda symbol, market: fetch_stock_data(symbol, "1y", market),
+        freshness=lambda symbol, market: freshness("stock_data", symbol, market, period="1y"),
+        essential=True,
+    ),
+    "info": Source(
+        fetch=fetch_stock_info,
+        freshness=lambda symbol, market: freshness("stock_info", symbol, market),
+    ),
+    "financials": Source(
+        fetch=fetch_stock_financials,
+        freshness=lambda symbol, market: freshness("stock_financials", symbol, market),
+        requires=("info",),
+    ),
+    "index": Source(
+        fetch=lambda symbol, market: fetch_index_data(get_market_config(market)["index"], market, "6mo"),
+        freshness=lambda symbol, market: freshness("index_data", get_market_config(market)["index"],
+                                                   market, period="6mo"),
+    ),
+}
+
+# In page order
+CATEGORIES: dict[str, Category] = {
+    "technical": Category(
+        analyze=technical_analysis,
+        sources=("prices",),
+        sections=("Price", "Moving Averages", "Momentum", "Trend Strength", "Volatility", "Volume",
+                  "Support / Resistance", "Fibonacci Levels (52-wk)", "Overall Signal"),
+    ),
+    "fundamental": Category(
+        analyze=fundamental_analysis,
+        sources=("info",),
+        sections=("Company Info", "Valuation", "Earnings & Growth", "Profitability", "Cash Flow",
+                  "Financial Health", "Dividends", "Risk & Range", "Overall Rating"),
+    ),
+    "piotroski": Category(
+        analyze=piotroski_fscore,
+        sources=("financials",),
+        sections=("Piotroski F-Score", "Profitability (4 pts)", "Leverage & Liquidity (3 pts)",
+                  "Operating Efficiency (2 pts)"),
+    ),
+    "canslim": Category(
+        analyze=canslim_analysis,
+        sources=("financials", "prices", "index"),
+        sections=("C — Current Earnings", "A — Annual Earnings", "N — New Highs", "S — Supply & Demand",
+                  "L — Leader or Laggard", "I — Institutional Sponsorship", "M — Market Direction",
+                  "CAN SLIM Rating"),
+    ),
+}
+
+# Selects every category's summary section
+SUMMARY = "summary"
+
+
+def slug(name: str) -> str:
+    """URL-friendly section name ("C — Current Earnings" -> "c-current-earnings")."""
+    return "-".join(re.findall(r"[a-z0-9]+", name.lower()))
+
+
+@dataclass(frozen=True)
+class AnalysisPlan:
+    categories: tuple[str, ...]
+    sources: tuple[str, ...]
+    # Section slugs to emit (SUMMARY for summaries), or None for all
+    sections: frozenset[str] | None = None
+
+    @property
+    def key(self) -> str:
+        """Stable identifier of the requested output, for caching."""
+        sections = ",".join(sorted(self.sections)) if self.sections is not None else "*"
+        return f"{','.join(self.categories)}|{sections}"
+
+    def freshness(self, symbol: str, market: str) -> dict:
+        """Freshness of the planned sources (the analyze stream's "meta" payload)."""
+        sources = {name: SOURCES[name].freshness(symbol, market) for name in self.sources}
+        states = {s["refresh"] for s in sources.values()}
+        return {
+            "stale": any(s["stale"] for s in sources.values()),
+            "fetched_at": min((s["fetched_at"] for s in sources.values() if s["fetched_at"]), default=None),
+            # A failed source outweighs one still refreshing: its data won't get newer on its own
+            "refresh": "failed" if "failed" in states else "refreshing" if "refreshing" in states else None,
+            "sources": sources,
+        }
+
+    def wants(self, section: dict) -> bool:
+        if self.sections is None:
+            return True
+        if section.get("is_summary") and SUMMARY in self.sections:
+            return True
+        return slug(section["section"]) in self.sections
+
+
+def run_category(name: str, symbol: str, market: str):
+    """Yield a category's sections in order.
+
+    Missing data (ValueError) ends the category with an {"error": message}
+    item instead of raising, so it doesn't cut short the other categories.
+    """
+    try:
+        yield from CATEGORIES[name].analyze(symbol, market=market)
+    except ValueError as e:
+        yield {"error": str(e)}
+
+
+def _with_requirements(names) -> list[str]:
+    needed: list[str] = []
+
+    def visit(name):
+        if name in needed:
+            return
+        for dependency in SOURCES[name].requires:
+            visit(dependency)
+        needed.append(name)
+
+    for name in names:
+        visit(name)
+    return needed
+
+
+def plan(categories: list[str] | None = None, sections: list[str] | None = None) -> AnalysisPlan:
+    """Resolve requested categories/sections to what has to run.
+
+    Args:
+        categories: Category names; None or empty for all.
+        sections: Section slugs (see slug()) or "summary"; None or empty for
+            all sections of the selected categories.
+
+    Raises:
+        ValueError: On an unknown category or section, or if the requested
+            sections don't occur in the requested categories.
+    """
+    unknown = [c for c in categories or () if c not in CATEGORIES]
+    if unknown:
+        raise ValueError(f"Unknown categories: {', '.join(unknown)} (expected {', '.join(CATEGORIES)})")
+    selected = [c for c in CATEGORIES if not categories or c in categories]
+
+    wanted = None
+    if sections:
+        wanted = frozenset(slug(s) for s in sections)
+        known = {slug(name) for c in CATEGORIES.values() for name in c.sections} | {SUMMARY}
+        unknown = sorted(wanted - known)
+        if unknown:
+            raise ValueError(f"Unknown sections: {', '.join(unknown)}")
+        if SUMMARY not in wanted:
+            selected = [c for c in selected
+                        if wanted & {slug(name) for name in CATEGORIES[c].sections}]
+        if not selected:
+            raise ValueError("None of the requested sections belong to the requested categories")
+
+    sources = _with_requirements(s for c in selected for s in CATEGORIES[c].sources)
+    return AnalysisPlan(categories=tuple(selected), sources=tuple(sources), sections=wanted)
+
+
+FULL = plan()
@@ -0,0 +1,66 @@
+"""Session-scoped cache of complete /api/analyze results.
+
+An analysis only changes when its inputs do, i.e. once per market session.
+The complete result for a (symbol, market, session_date) is kept in
+core.cache, so it expires at the market's next refresh boundary like the
+data it was computed from. It is stored pre-encoded, both as the SSE
+payload the streaming endpoint replays in one write and as the JSON body of
+the plain endpoint, along with an ETag and a Last-Modified time for
+conditional requests. A repeat view costs a cache lookup.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from sse_starlette.sse import ServerSentEvent
+
+from core import cache
+
+
+@dataclass(frozen=True)
+class AnalysisResult:
+    sse: bytes
+    body: bytes
+    etag: str
+    last_modified: datetime
+
+
+def build(symbol: str, market: str, session_date: str, meta: dict, sections: list[dict],
+          **extra) -> AnalysisResult:
+    """Encode a finished analysis.
+
+    Args:
+        meta: The stream's "meta" event payload (data freshness).
+        sections: Section payloads (with "category" and "index") in page order.
+        extra: Additional top-level fields of the JSON document.
+    """
+    events = [("meta", meta)]
+    events += [("section", section) for section in sections]
+    events.append(("done", {"status": "complete", "stale": meta.get("stale", False)}))
+    sse = b"".join(ServerSentEvent(event=event, data=json.dumps(data)).encode() for event, data in events)
+
+    body = json.dumps({
+        "symbol": symbol,
+        "market": market,
+        "session_date": session_date,
+        **extra,
+        "meta": meta,
+        "sections": sections,
+    }).encode()
+    etag = f'"{hashlib.sha1(body).hexdigest()}"'
+    # HTTP dates have one-second resolution
+    last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+    return AnalysisResult(sse=sse, body=body, etag=etag, last_modified=last_modified)
+
+
+def get(symbol: str, market: str, session_date: str, variant: str = "") -> AnalysisResult | None:
+    """Cached result; variant tells apart subsets of the output (core.analysis_plan keys)."""
+    return cache.get("analysis_result", symbol, market, session=session_date, variant=variant)
+
+
+def put(symbol: str, market: str, session_date: str, result: AnalysisResult, variant: str = ""):
+    cache.set("analysis_result", symbol, market, result, session=session_date, variant=variant)
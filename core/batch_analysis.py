@@ -0,0 +1,162 @@
+"""Watchlist analysis: many symbols in one request (POST /api/analyze/batch).
+
+analyze_batch() produces one record per symbol holding each category's
+summary verdict, and optionally all sections. Records come in completion
+order. A category that lacks data gets {"error": message} as its verdict,
+and the other categories are unaffected.
+
+Results are shared with the single-symbol endpoints through
+core.analysis_results, so symbols anyone viewed this session come back
+without any computation. The rest share a single multi-ticker price
+download and one market index fetch. They are then analyzed on the
+adaptive work queue (core.work_queue), which retries network failures.
+Missing price history fails the whole record and is not retried, as
+in the analyze stream. Categories run one after another within a
+symbol's worker: their inputs are fetched up front, so parallelism comes
+from running many symbols at once.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import os
+from typing import AsyncIterator
+
+from core import analysis_results
+from core.analysis_plan import SOURCES, AnalysisPlan, run_category
+from core.cache import current_session_date
+from core.group_analysis import prefetch_prices
+from core.work_queue import run_adaptive
+
+logger = logging.getLogger(__name__)
+
+MAX_SYMBOLS = int(os.getenv("BATCH_ANALYSIS_MAX_SYMBOLS", 500))
+CONCURRENCY = int(os.getenv("BATCH_ANALYSIS_CONCURRENCY", 8))
+
+
+def analyze_symbol(symbol: str, market: str, session_date: str,
+                   analysis: AnalysisPlan) -> analysis_results.AnalysisResult:
+    """Run a planned analysis for one symbol and cache the result for the session.
+
+    Same output as the analyze stream, computed without streaming. Like the
+    stream, a category that fails for missing data is listed under the
+    result's "errors" and the result isn't cached.
+
+    Raises:
+        ValueError: If the symbol's price history is missing.
+    """
+    for name in analysis.sources:
+        try:
+            SOURCES[name].fetch(symbol, market)
+        except Exception:
+            # Optional sources are best effort, as in the stream: their categories report the problem
+            if SOURCES[name].essential:
+                raise
+
+    meta = analysis.freshness(symbol, market)
+    sections = []
+    errors = {}
+    for category in analysis.categories:
+        for index, section in enumerate(run_category(category, symbol, market)):
+            if "error" in section:
+                errors[category] = section["error"]
+            elif analysis.wants(section):
+                sections.append({"category": category, "index": index, **section})
+
+    extra = {"errors": errors} if errors else {}
+    result = analysis_results.build(symbol, market, session_date, meta, sections,
+                                    categories=list(analysis.categories), **extra)
+    if not meta["stale"] and not errors:
+        analysis_results.put(symbol, market, session_date, result, variant=analysis.key)
+    return result
+
+
+def _record(index: int, symbol: str, result: analysis_results.AnalysisResult,
+            include_sections: bool) -> dict:
+    document = json.loads(result.body)
+    verdicts = {}
+    for section in document["sections"]:
+        if section.get("is_summary"):
+            verdicts[section["category"]] = {"section": section["section"], "rows": section["rows"]}
+    for category, message in document.get("errors", {}).items():
+        verdicts[category] = {"error": message}
+    record = {
+        "type": "result",
+        "index": index,
+        "symbol": symbol,
+        "stale": document["meta"]["stale"],
+        "verdicts": verdicts,
+    }
+    if include_sections:
+        record["sections"] = document["sections"]
+    return record
+
+
+def _error(index: int, symbol: str, message: str) -> dict:
+    return {"type": "error", "index": index, "symbol": symbol, "message": message}
+
+
+async def analyze_batch(symbols: list[str], market: str, analysis: AnalysisPlan, *,
+                        include_sections: bool = False) -> AsyncIterator[dict]:
+    """Yield a record per symbol as each finishes, then a "done" summary.
+
+    Args:
+        symbols: Tickers, deduplicated; index in the records is the position
+            in the deduplicated list.
+        market: Market code ("IN" or "US").
+        analysis: Categories to run (see core.analysis_plan.plan).
+        include_sections: Add every section of the analysis to the records,
+            not just the summary verdicts.
+    """
+    symbols = list(dict.fromkeys(symbols))
+    session_date = current_session_date(market)
+    failed = 0
+
+    pending = []
+    for index, symbol in enumerate(symbols):
+        cached = analysis_results.get(symbol, market, session_date, variant=analysis.key)
+        if cached:
+            yield _record(index, symbol, cached, include_sections)
+        else:
+            pending.append(symbol)
+
+    if pending:
+        # Data shared by all symbols is fetched once up front instead of per worker
+        if "prices" in analysis.sources:
+            await asyncio.to_thread(prefetch_prices, pending, market)
+        if "index" in analysis.sources:
+            try:
+                await asyncio.to_thread(SOURCES["index"].fetch, pending[0], market)
+            except Exception:
+                logger.warning("Index prefetch failed for %s", market, exc_info=True)
+
+        def work(symbol: str):
+            # Missing data won't appear on a retry, so it's a result rather than an exception
+            try:
+                return analyze_symbol(symbol, market, session_date, analysis), None
+            except ValueError as e:
+                return None, str(e)
+
+        positions = {symbol: index for index, symbol in enumerate(symbols)}
+        async for item in run_adaptive(work, pending, max_concurrency=CONCURRENCY):
+            index = positions[item.item]
+            if item.error is not None:
+                failed += 1
+                yield _error(index, item.item, str(item.error))
+                continue
+            result, message = item.value
+            if message is not None:
+                failed += 1
+                yield _error(index, item.item, message)
+            else:
+                yield _record(index, item.item, result, include_sections)
+
+    yield {
+        "type": "done",
+        "total": len(symbols),
+        "ok": len(symbols) - failed,
+        "failed": failed,
+        "computed": len(pending),
+    }
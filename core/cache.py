@@ -1,26 +1,68 @@
-"""Market-aware in-memory cache for stock data.
+"""Market-aware cache for stock data.
 
-IN stocks invalidate after Indian market close (4:00 PM IST daily).
-US stocks invalidate after US market close  (5:00 AM IST daily).
+Entries invalidate at the market's next refresh boundary: the session close
+plus a settle lag, on trading days only (core.markets calendars), e.g.
+4:00 PM IST for NSE and 7:00 PM ET for NYSE. Data cached on a Friday stays
+valid through the weekend and exchange holidays.
 Failed fetches are never cached — they retry fresh on the next call.
+
+Storage is pluggable (see core.cache_backends), selected by CACHE_BACKEND:
+    "memory"  — per-process LRU dict (default).
+    "sqlite"  — shared SQLite file at CACHE_SQLITE_PATH
+                (default: <project>/data/cache.sqlite3), so uvicorn workers
+                and the bot reuse each other's fetches.
+Either way the store is bounded by CACHE_MAX_BYTES (default 256 MB), with
+least recently used entries evicted first.
+
+Opt-in stale modes (CACHE_STALE_MODE) keep expired entries around for
+CACHE_STALE_MAX_HOURS (default 72) past their boundary:
+    "if-error"          — a failed refresh falls back to the stale entry.
+    "while-revalidate"  — the stale entry is served immediately while a
+                          background refresh runs (and kept if it fails).
+get() never returns stale data; callers opt in through get_entry().
 """
 
+import builtins
 import logging
-from datetime import datetime, time, timedelta
+import os
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
 from zoneinfo import ZoneInfo
 
+from core.cache_backends import CacheBackend, MemoryBackend, SQLiteBackend
+from core.markets import get_calendar
+
 logger = logging.getLogger(__name__)
 
 IST = ZoneInfo("Asia/Kolkata")
 
-# Refresh boundaries in IST
-REFRESH_TIMES = {
-    "IN": time(16, 0),  # 4:00 PM IST — after Indian market close
-    "US": time(5, 0),   # 5:00 AM IST — after US market close
-}
+MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+STALE_IF_ERROR = "if-error"
+STALE_WHILE_REVALIDATE = "while-revalidate"
+STALE_MODE = os.getenv("CACHE_STALE_MODE", "").strip().lower()
+if STALE_MODE not in (STALE_IF_ERROR, STALE_WHILE_REVALIDATE):
+    STALE_MODE = ""
+# How long an expired entry stays usable as a stale fallback
+STALE_GRACE = timedelta(hours=float(os.getenv("CACHE_STALE_MAX_HOURS", 72))) if STALE_MODE else timedelta(0)
+
+# Seconds a process waits for another process's fetch of the same key (shared backends)
+FILL_LOCK_TIMEOUT = float(os.getenv("CACHE_FILL_LOCK_TIMEOUT", 30))
+
+
+def _create_backend() -> CacheBackend:
+    name = os.getenv("CACHE_BACKEND", "memory").strip().lower()
+    if name == "sqlite":
+        path = os.getenv("CACHE_SQLITE_PATH",
+                         Path(__file__).resolve().parent.parent / "data" / "cache.sqlite3")
+        return SQLiteBackend(MAX_BYTES, path)
+    if name != "memory":
+        logger.warning("Unknown CACHE_BACKEND '%s' — using in-memory cache", name)
+    return MemoryBackend(MAX_BYTES)
+
 
-# {cache_key: (data, fetched_at)}
-_store: dict[tuple, tuple] = {}
+_backend = _create_backend()
 
 
 def _make_key(func_name: str, symbol: str, market: str, **kwargs) -> tuple:
@@ -28,60 +70,117 @@ def _make_key(func_name: str, symbol: str, market: str, **kwargs) -> tuple:
     return (func_name, symbol.upper(), market.upper(), extras)
 
 
-def _last_refresh_boundary(market: str) -> datetime:
+def _last_refresh_boundary(market: str, now: datetime | None = None) -> datetime:
     """Return the most recent refresh boundary for the given market."""
-    now = datetime.now(IST)
-    refresh_time = REFRESH_TIMES.get(market.upper(), REFRESH_TIMES["IN"])
-    boundary_today = datetime.combine(now.date(), refresh_time, tzinfo=IST)
-
-    if now >= boundary_today:
-        return boundary_today
-    else:
-        return boundary_today - timedelta(days=1)
+    if now is None:
+        now = datetime.now(IST)
+    return get_calendar(market).last_boundary(now)
+
+
+def _next_refresh_boundary(market: str, after: datetime) -> datetime:
+    """Return the first refresh boundary strictly after the given time."""
+    return get_calendar(market).next_boundary(after)
+
+
+def current_session_date(market: str, now: datetime | None = None) -> str:
+    """Trading day (YYYY-MM-DD) whose close is the most recent refresh boundary."""
+    if now is None:
+        now = datetime.now(IST)
+    return get_calendar(market).last_session(now).isoformat()
+
+
+def _estimate_size(obj, _seen: builtins.set | None = None, _depth: int = 0) -> int:
+    """Rough in-memory size of a cached value in bytes."""
+    if _seen is None:
+        _seen = builtins.set()
+    if id(obj) in _seen or _depth > 4:
+        return 0
+    _seen.add(id(obj))
+
+    usage = getattr(obj, "memory_usage", None)
+    if callable(usage):
+        # pandas DataFrame (per-column Series) or Series (int)
+        try:
+            result = usage(deep=True)
+            return int(result.sum()) if hasattr(result, "sum") else int(result)
+        except TypeError:
+            pass
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_estimate_size(k, _seen, _depth + 1) + _estimate_size(v, _seen, _depth + 1)
+                    for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, builtins.set, frozenset)):
+        size += sum(_estimate_size(item, _seen, _depth + 1) for item in obj)
+    elif hasattr(obj, "__dict__"):
+        size += _estimate_size(vars(obj), _seen, _depth + 1)
+    return size
 
 
 def get(func_name: str, symbol: str, market: str, **kwargs):
     """Return cached data if still valid, otherwise None."""
+    entry = get_entry(func_name, symbol, market, **kwargs)
+    if entry is None or entry[2]:
+        return None
+    return entry[0]
+
+
+def get_entry(func_name: str, symbol: str, market: str, **kwargs) -> tuple | None:
+    """Return (data, fetched_at, is_stale) for a cached entry, or None.
+
+    Stale entries are only returned while a stale mode is enabled and the
+    entry is within STALE_GRACE of its boundary; otherwise they are dropped.
+    """
     key = _make_key(func_name, symbol, market, **kwargs)
-    entry = _store.get(key)
+    entry = _backend.get(key)
     if entry is None:
         logger.debug("CACHE MISS  %s", key)
         return None
 
-    data, fetched_at = entry
-    boundary = _last_refresh_boundary(market)
+    data, fetched_at, expires_at = entry
+    now = datetime.now(IST)
+    if now >= expires_at + STALE_GRACE:
+        _backend.delete(key)
+        logger.debug("CACHE EXPIRED %s (fetched %s, expired %s)", key, fetched_at, expires_at)
+        return None
 
-    if fetched_at < boundary:
+    if now >= expires_at:
         # Data was fetched before the last refresh boundary — stale
-        del _store[key]
-        logger.debug("CACHE STALE %s (fetched %s, boundary %s)", key, fetched_at, boundary)
-        return None
+        logger.debug("CACHE STALE %s (fetched %s, expired %s)", key, fetched_at, expires_at)
+        return data, fetched_at, True
 
     logger.debug("CACHE HIT   %s (fetched %s)", key, fetched_at)
-    return data
+    return data, fetched_at, False
+
+
+def set(func_name: str, symbol: str, market: str, data, **kwargs):
+    """Store data in cache with the current timestamp.
 
+    The backend purges entries past their stale grace and evicts least
+    recently used entries if the byte budget is exceeded. Values larger
+    than the whole budget are not cached.
+    """
+    key = _make_key(func_name, symbol, market, **kwargs)
+    size = _estimate_size(data)
+    if size > MAX_BYTES:
+        logger.warning("CACHE SKIP  %s (%d bytes exceeds budget %d)", key, size, MAX_BYTES)
+        _backend.delete(key)
+        return
 
-def _purge_stale() -> int:
-    """Remove all expired entries from the cache. Returns count purged."""
     now = datetime.now(IST)
-    stale_keys = []
-    for key, (_, fetched_at) in _store.items():
-        # market is the 3rd element in the key tuple
-        market = key[2]
-        refresh_time = REFRESH_TIMES.get(market, REFRESH_TIMES["IN"])
-        boundary_today = datetime.combine(now.date(), refresh_time, tzinfo=IST)
-        boundary = boundary_today if now >= boundary_today else boundary_today - timedelta(days=1)
-        if fetched_at < boundary:
-            stale_keys.append(key)
-    for key in stale_keys:
-        logger.debug("CACHE PURGE %s", key)
-        del _store[key]
-    return len(stale_keys)
+    expires_at = _next_refresh_boundary(market, now)
+    _backend.set(key, data, now, expires_at, expires_at + STALE_GRACE, size)
 
 
-def set(func_name: str, symbol: str, market: str, data, **kwargs):
-    """Store data in cache with the current timestamp. Purges stale entries."""
-    purged = _purge_stale()
-    key = _make_key(func_name, symbol, market, **kwargs)
-    _store[key] = (data, datetime.now(IST))
-    logger.debug("CACHE SET   %s (store size: %d, purged: %d)", key, len(_store), purged)
+def fill_lock(func_name: str, symbol: str, market: str, **kwargs):
+    """Context manager held while fetching a missing entry.
+
+    With a shared backend, other processes missing the same key wait here
+    (up to CACHE_FILL_LOCK_TIMEOUT seconds) and then find it cached.
+    """
+    return _backend.fill_lock(_make_key(func_name, symbol, market, **kwargs), FILL_LOCK_TIMEOUT)
+
+
+def stats() -> dict:
+    """Return backend name, entry count and byte usage of the cache."""
+    return _backend.stats()
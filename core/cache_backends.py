@@ -0,0 +1,292 @@
+"""Storage backends for core.cache.
+
+core.cache decides *when* entries expire (market refresh boundaries, stale
+grace); a backend only stores entries and enforces the byte budget.
+
+    MemoryBackend  — per-process LRU dict (default).
+    SQLiteBackend  — one SQLite file in WAL mode shared by every process on
+                     the host (uvicorn workers, bot.py), so a symbol fetched
+                     by one process is reused by all of them.
+"""
+
+from __future__ import annotations
+
+import builtins
+import logging
+import pickle
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+IST = ZoneInfo("Asia/Kolkata")
+
+
+class CacheBackend(ABC):
+    """Key/value store for cache entries.
+
+    Keys are the tuples built by core.cache._make_key. Each entry carries the
+    time it was fetched, the refresh boundary it expires at, and the later
+    purge_at time after which it is dropped altogether.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+
+    @abstractmethod
+    def get(self, key: tuple) -> tuple | None:
+        """Return (data, fetched_at, expires_at) and mark the entry as recently used."""
+
+    @abstractmethod
+    def set(self, key: tuple, data, fetched_at: datetime, expires_at: datetime,
+            purge_at: datetime, size: int):
+        """Store an entry, replacing any previous one for key."""
+
+    @abstractmethod
+    def delete(self, key: tuple):
+        """Drop an entry if present."""
+
+    @abstractmethod
+    def stats(self) -> dict:
+        """Return at least "entries", "bytes" and "max_bytes"."""
+
+    @contextmanager
+    def fill_lock(self, key: tuple, timeout: float):
+        """Hold the right to fetch key while other processes wait for it.
+
+        Only meaningful for shared backends; within one process
+        core.singleflight already coalesces concurrent misses.
+        """
+        yield
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU store bounded by max_bytes.
+
+    Entries are also indexed by purge time, so purging touches only
+    entries that are due rather than the whole store.
+    """
+
+    def __init__(self, max_bytes: int):
+        super().__init__(max_bytes)
+        # {key: (data, fetched_at, expires_at, purge_at, size)}, least recently used first
+        self._store: OrderedDict[tuple, tuple] = OrderedDict()
+        # {purge_at: {key, ...}}
+        self._purge_index: dict[datetime, builtins.set] = {}
+        self._total_bytes = 0
+        self._lock = threading.RLock()
+
+    def _remove(self, key: tuple):
+        """Drop an entry and its purge-index reference. Caller holds _lock."""
+        _, _, _, purge_at, size = self._store.pop(key)
+        self._total_bytes -= size
+        keys = self._purge_index.get(purge_at)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._purge_index[purge_at]
+
+    def _purge(self, now: datetime) -> int:
+        due = sorted(t for t in self._purge_index if t <= now)
+        purged = 0
+        for purge_at in due:
+            for key in list(self._purge_index.get(purge_at, ())):
+                logger.debug("CACHE PURGE %s", key)
+                self._remove(key)
+                purged += 1
+        return purged
+
+    def _evict_to_budget(self) -> int:
+        evicted = 0
+        while self._total_bytes > self.max_bytes and self._store:
+            key = next(iter(self._store))
+            logger.debug("CACHE EVICT %s", key)
+            self._remove(key)
+            evicted += 1
+        return evicted
+
+    def get(self, key: tuple) -> tuple | None:
+        with self._lock:
+            entry = self._store.get(key)
+            if entry is None:
+                return None
+            self._store.move_to_end(key)
+            return entry[:3]
+
+    def set(self, key, data, fetched_at, expires_at, purge_at, size):
+        with self._lock:
+            purged = self._purge(fetched_at)
+            if key in self._store:
+                self._remove(key)
+            self._store[key] = (data, fetched_at, expires_at, purge_at, size)
+            self._purge_index.setdefault(purge_at, builtins.set()).add(key)
+            self._total_bytes += size
+            evicted = self._evict_to_budget()
+            logger.debug("CACHE SET   %s (%d bytes, store: %d entries / %d bytes, purged: %d, evicted: %d)",
+                         key, size, len(self._store), self._total_bytes, purged, evicted)
+
+    def delete(self, key: tuple):
+        with self._lock:
+            if key in self._store:
+                self._remove(key)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"backend": "memory", "entries": len(self._store),
+                    "bytes": self._total_bytes, "max_bytes": self.max_bytes}
+
+
+class SQLiteBackend(CacheBackend):
+    """Host-wide store in a single SQLite database (WAL mode).
+
+    Values are pickled; an entry's size is its pickled length. Values that
+    cannot be pickled are skipped (not cached) rather than failing the fetch.
+    A small locks table lets one process fetch a missing key while the
+    others wait for it to appear.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            key TEXT PRIMARY KEY,
+            value BLOB NOT NULL,
+            fetched_at REAL NOT NULL,
+            expires_at REAL NOT NULL,
+            purge_at REAL NOT NULL,
+            size INTEGER NOT NULL,
+            last_access REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS entries_purge_at ON entries (purge_at);
+        CREATE INDEX IF NOT EXISTS entries_last_access ON entries (last_access);
+        CREATE TABLE IF NOT EXISTS locks (
+            key TEXT PRIMARY KEY,
+            until REAL NOT NULL
+        );
+    """
+
+    # Seconds between polls while waiting for another process's fetch
+    LOCK_POLL = 0.1
+
+    def __init__(self, max_bytes: int, path: str | Path):
+        super().__init__(max_bytes)
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._conn().executescript(self._SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        """Return this thread's connection (sqlite3 connections aren't shareable across threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _key(key: tuple) -> str:
+        return repr(key)
+
+    def get(self, key: tuple) -> tuple | None:
+        conn = self._conn()
+        k = self._key(key)
+        row = conn.execute(
+            "SELECT value, fetched_at, expires_at FROM entries WHERE key = ?", (k,),
+        ).fetchone()
+        if row is None:
+            return None
+        try:
+            data = pickle.loads(row[0])
+        except Exception:
+            logger.warning("CACHE CORRUPT %s — dropping entry", key, exc_info=True)
+            self.delete(key)
+            return None
+        conn.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), k))
+        return (data,
+                datetime.fromtimestamp(row[1], IST),
+                datetime.fromtimestamp(row[2], IST))
+
+    def set(self, key, data, fetched_at, expires_at, purge_at, size):
+        try:
+            blob = pickle.dumps(data, protocol=pickle.HIGHEST_PROTOCOL)
+        except Exception as e:
+            logger.debug("CACHE SKIP  %s (not picklable: %s)", key, e)
+            return
+        if len(blob) > self.max_bytes:
+            logger.warning("CACHE SKIP  %s (%d bytes exceeds budget %d)", key, len(blob), self.max_bytes)
+            return
+
+        conn = self._conn()
+        now = fetched_at.timestamp()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            purged = conn.execute("DELETE FROM entries WHERE purge_at <= ?", (now,)).rowcount
+            conn.execute(
+                "INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (self._key(key), blob, now, expires_at.timestamp(), purge_at.timestamp(),
+                 len(blob), time.time()),
+            )
+            evicted = self._evict_to_budget(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        logger.debug("CACHE SET   %s (%d bytes, purged: %d, evicted: %d)", key, len(blob), purged, evicted)
+
+    def _evict_to_budget(self, conn: sqlite3.Connection) -> int:
+        """Delete least recently used rows until the total size fits. Caller holds a write transaction."""
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        excess = total - self.max_bytes
+        if excess <= 0:
+            return 0
+        evict = []
+        for k, size in conn.execute("SELECT key, size FROM entries ORDER BY last_access"):
+            evict.append((k,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM entries WHERE key = ?", evict)
+        return len(evict)
+
+    def delete(self, key: tuple):
+        self._conn().execute("DELETE FROM entries WHERE key = ?", (self._key(key),))
+
+    def stats(self) -> dict:
+        count, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries",
+        ).fetchone()
+        return {"backend": "sqlite", "path": str(self.path), "entries": count,
+                "bytes": total, "max_bytes": self.max_bytes}
+
+    @contextmanager
+    def fill_lock(self, key: tuple, timeout: float):
+        """Wait until no other process is fetching key, then hold its lock.
+
+        Locks expire after `timeout` seconds so a crashed holder can't block
+        the key forever; a waiter that times out goes ahead and fetches.
+        """
+        conn = self._conn()
+        k = self._key(key)
+        deadline = time.monotonic() + timeout
+        acquired = False
+        while True:
+            now = time.time()
+            conn.execute("DELETE FROM locks WHERE until <= ?", (now,))
+            acquired = conn.execute(
+                "INSERT OR IGNORE INTO locks VALUES (?, ?)", (k, now + timeout),
+            ).rowcount == 1
+            if acquired or time.monotonic() >= deadline:
+                break
+            time.sleep(self.LOCK_POLL)
+        try:
+            yield
+        finally:
+            if acquired:
+                conn.execute("DELETE FROM locks WHERE key = ?", (k,))
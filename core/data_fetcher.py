@@ -1,8 +1,142 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
 import yfinance as yf
 import pandas as pd
 
 from core.markets import get_market_config
-from core import cache
+from core.singleflight import SingleFlight
+from core import cache, ohlcv_store, statement_store
+from core.statements import Statement, normalize
+
+logger = logging.getLogger(__name__)
+
+# Tickers per multi-ticker download request in fetch_stock_data_batch
+BATCH_CHUNK_SIZE = 50
+
+_flight = SingleFlight()
+
+# Background refreshes for stale-while-revalidate; _refreshing holds keys already queued
+_refresh_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="cache-refresh")
+_refreshing: set[tuple] = set()
+_refreshing_lock = threading.Lock()
+
+# Statement downloads for FinancialsBundle run here, all statements of a symbol in parallel
+_statement_pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix="statements")
+
+
+@dataclass(frozen=True)
+class FinancialsBundle:
+    """Fundamentals of one stock, fully downloaded up front.
+
+    Shared by every consumer through the cache, so treat the info dict as
+    read-only. Statements are normalized onto the canonical line items of
+    core.statements, most recent period first; a statement Yahoo has no
+    data for is an empty Statement.
+    """
+
+    info: dict
+    financials: Statement            # annual income statement
+    balance_sheet: Statement         # annual balance sheet
+    cashflow: Statement              # annual cash flow statement
+    quarterly_financials: Statement  # quarterly income statement
+
+    @property
+    def digests(self) -> dict[str, str]:
+        """Content hash of each statement, keyed by attribute name."""
+        return {name: getattr(self, name).digest() for name in _STATEMENTS}
+
+
+_STATEMENTS = ("financials", "balance_sheet", "cashflow", "quarterly_financials")
+
+
+def _cached_fetch(func_name: str, symbol: str, market: str, loader, **kwargs):
+    """Return cached data, or run loader once for all concurrent callers and cache it.
+
+    Concurrent misses for the same (func_name, symbol, market, kwargs) wait
+    for the first caller's fetch instead of hitting Yahoo themselves — in
+    this process via single-flight, across processes via cache.fill_lock.
+    Loader exceptions reach every waiter and are not cached.
+
+    With a cache stale mode enabled, an entry past its refresh boundary is
+    either returned at once while a background refresh runs
+    ("while-revalidate"), or returned when the refresh fails ("if-error").
+    """
+    entry = cache.get_entry(func_name, symbol, market, **kwargs)
+    if entry is not None and not entry[2]:
+        return entry[0]
+
+    def load():
+        # A flight that finished just before this one started may have filled the cache
+        cached = cache.get(func_name, symbol, market, **kwargs)
+        if cached is not None:
+            return cached
+        with cache.fill_lock(func_name, symbol, market, **kwargs):
+            # ...and so may another process sharing the cache backend
+            cached = cache.get(func_name, symbol, market, **kwargs)
+            if cached is not None:
+                return cached
+            data = loader()
+            cache.set(func_name, symbol, market, data, **kwargs)
+            return data
+
+    key = (func_name, symbol.upper(), market.upper(), tuple(sorted(kwargs.items())))
+    if entry is None:
+        return _flight.do(key, load)
+
+    if cache.STALE_MODE == cache.STALE_WHILE_REVALIDATE:
+        _refresh_in_background(key, load)
+        return entry[0]
+
+    try:
+        return _flight.do(key, load)
+    except Exception as e:
+        logger.warning("Refresh of %s failed (%s) — serving data fetched %s", key, e, entry[1])
+        return entry[0]
+
+
+def _refresh_in_background(key: tuple, load):
+    """Queue load() on the refresh pool unless a refresh for key is already queued."""
+    with _refreshing_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def run():
+        try:
+            _flight.do(key, load)
+        except Exception as e:
+            # The stale entry stays in the cache as the fallback
+            logger.warning("Background refresh of %s failed: %s", key, e)
+        finally:
+            with _refreshing_lock:
+                _refreshing.discard(key)
+
+    _refresh_pool.submit(run)
+
+
+def freshness(func_name: str, symbol: str, market: str = "IN", **kwargs) -> dict:
+    """Describe how fresh the cached data for a fetcher call is.
+
+    Returns:
+        Dict with "stale" (True if past its refresh boundary or not cached),
+        "fetched_at" (ISO timestamp, or None if not cached) and "refresh":
+        None for fresh data, "refreshing" while a background refresh of
+        stale data runs, or "failed" when the latest fetch failed and stale
+        data (or nothing) is all there is.
+    """
+    entry = cache.get_entry(func_name, symbol, market, **kwargs)
+    if entry is None:
+        return {"stale": True, "fetched_at": None, "refresh": "failed"}
+    _, fetched_at, stale = entry
+    refresh = None
+    if stale:
+        key = (func_name, symbol.upper(), market.upper(), tuple(sorted(kwargs.items())))
+        with _refreshing_lock:
+            refresh = "refreshing" if key in _refreshing else "failed"
+    return {"stale": stale, "fetched_at": fetched_at.isoformat(), "refresh": refresh}
 
 
 def fetch_stock_data(symbol: str, period: str = "1y", market: str = "IN") -> pd.DataFrame:
@@ -19,49 +153,232 @@ def fetch_stock_data(symbol: str, period: str = "1y", market: str = "IN") -> pd.
     Raises:
         ValueError: If no data is found for the symbol.
     """
-    cached = cache.get("stock_data", symbol, market, period=period)
-    if cached is not None:
-        return cached
+    def load():
+        config = get_market_config(market)
+        suffix = config["suffix"]
+        ticker_symbol = f"{symbol}{suffix}"
+        df = _load_history(symbol, ticker_symbol, period, market)
+        if df.empty:
+            raise ValueError(f"No data found for {ticker_symbol}. Check the ticker symbol.")
+        return df
+
+    return _cached_fetch("stock_data", symbol, market, load, period=period)
 
-    config = get_market_config(market)
-    suffix = config["suffix"]
-    ticker_symbol = f"{symbol}{suffix}"
+
+def _load_history(symbol: str, ticker_symbol: str, period: str, market: str) -> pd.DataFrame:
+    """Return history for the period, downloading only bars missing from the on-disk store."""
     ticker = yf.Ticker(ticker_symbol)
+    start = ohlcv_store.period_start(period)
+    if start is None:
+        return ticker.history(period=period)
+
+    stored = ohlcv_store.load(symbol, market)
+    if stored is not None and ohlcv_store.covers(stored, start):
+        # Re-fetch from the last stored bar so a partial intraday bar gets replaced
+        fresh = ticker.history(start=stored.index[-1].strftime("%Y-%m-%d"))
+        df = _append_bars(symbol, market, stored, fresh, start)
+        if df is not None:
+            return df
+        logger.info("Corporate action for %s — refetching full history", ticker_symbol)
+        stored = None
+
     df = ticker.history(period=period)
+    return _replace_bars(symbol, market, stored, df, start)
+
+
+def _append_bars(symbol: str, market: str, stored: pd.DataFrame, fresh: pd.DataFrame,
+                 start: pd.Timestamp) -> pd.DataFrame | None:
+    """Merge incrementally fetched bars into the stored history.
+
+    Returns None if the new bars carry a dividend or split, in which case the
+    stored (adjusted) history is outdated and must be refetched in full. The
+    re-fetched last stored bar doesn't count: its action is already applied.
+    """
+    if fresh.empty:
+        return ohlcv_store.trim(stored, start)
+    new_bars = fresh[fresh.index.tz_convert(stored.index.tz) > stored.index[-1]]
+    if ohlcv_store.has_corporate_actions(new_bars):
+        return None
+    df = ohlcv_store.merge(stored, fresh)
+    ohlcv_store.save(symbol, market, df)
+    logger.debug("OHLCV APPEND %s/%s (%d new bars)", market, symbol, len(fresh))
+    return ohlcv_store.trim(df, start)
+
+
+def _replace_bars(symbol: str, market: str, stored: pd.DataFrame | None, df: pd.DataFrame,
+                  start: pd.Timestamp) -> pd.DataFrame:
+    """Store a fully fetched history and return the requested period of it."""
     if df.empty:
-        raise ValueError(f"No data found for {ticker_symbol}. Check the ticker symbol.")
+        return df
+    df = ohlcv_store.merge(stored, df)
+    ohlcv_store.save(symbol, market, df)
+    return ohlcv_store.trim(df, start)
 
-    cache.set("stock_data", symbol, market, df, period=period)
-    return df
 
+def fetch_stock_data_batch(symbols: list[str], period: str = "1y",
+                           market: str = "IN") -> dict[str, pd.DataFrame]:
+    """Fetch historical OHLCV data for many stocks using multi-ticker downloads.
 
-def fetch_stock_financials(symbol: str, market: str = "IN"):
-    """Return the yfinance Ticker object for accessing financial statements.
+    Cached symbols are served from cache; the rest are downloaded in chunks of
+    BATCH_CHUNK_SIZE tickers per request (incremental symbols grouped by their
+    last stored date) and written to the per-symbol cache entries that
+    fetch_stock_data reads. With a cache stale mode enabled, stale entries
+    are re-downloaded and kept as the result if the download fails.
+
+    Args:
+        symbols: Stock tickers (e.g. ["RELIANCE", "TCS"]).
+        period: yfinance period string (e.g. "1y", "6mo", "3mo").
+        market: Market code ("IN" for NSE, "US" for US stocks).
+
+    Returns:
+        Dict of symbol -> DataFrame. Symbols with no data, or whose download
+        failed and have no stale entry to fall back to, are omitted, so
+        callers can fall back to fetch_stock_data (which retries, or gives a
+        proper error).
+    """
+    results = {}
+    missing = []
+    stale = {}
+    for symbol in dict.fromkeys(symbols):
+        entry = cache.get_entry("stock_data", symbol, market, period=period)
+        if entry is not None and not entry[2]:
+            results[symbol] = entry[0]
+        else:
+            missing.append(symbol)
+            if entry is not None:
+                stale[symbol] = entry[0]
+    if not missing:
+        return results
+
+    start = ohlcv_store.period_start(period)
+    stored = {}
+    incremental: dict[str, list[str]] = {}  # last stored date -> symbols
+    full = []
+    for symbol in missing:
+        frame = ohlcv_store.load(symbol, market) if start is not None else None
+        stored[symbol] = frame
+        if frame is not None and ohlcv_store.covers(frame, start):
+            incremental.setdefault(frame.index[-1].strftime("%Y-%m-%d"), []).append(symbol)
+        else:
+            full.append(symbol)
+
+    failed = set()
+    for since, group in incremental.items():
+        fetched, errors = _download(group, market, start=since)
+        failed.update(errors)
+        for symbol in group:
+            if symbol in errors:
+                # Keep the stored history out of the cache: it isn't this session's data
+                continue
+            fresh = fetched.get(symbol, stored[symbol].iloc[0:0])
+            df = _append_bars(symbol, market, stored[symbol], fresh, start)
+            if df is None:
+                stored[symbol] = None
+                full.append(symbol)
+            else:
+                results[symbol] = df
+
+    if full:
+        fetched, errors = _download(full, market, period=period)
+        failed.update(errors)
+        for symbol, df in fetched.items():
+            if start is not None:
+                df = _replace_bars(symbol, market, stored.get(symbol), df, start)
+            results[symbol] = df
+
+    for symbol in missing:
+        if symbol in results:
+            cache.set("stock_data", symbol, market, results[symbol], period=period)
+        elif symbol in stale:
+            results[symbol] = stale[symbol]
+    logger.info("Batch fetch %s: %d cached, %d downloaded, %d failed, %d without data",
+                market, len(symbols) - len(missing), len(missing) - len(failed), len(failed),
+                len([s for s in missing if s not in results]))
+    return results
+
+
+def _download(symbols: list[str], market: str, **kwargs) -> tuple[dict[str, pd.DataFrame], set[str]]:
+    """Download history for many symbols, one multi-ticker request per chunk.
+
+    Returns:
+        (frames, failed): symbol -> DataFrame for symbols with data, and the
+        symbols whose chunk request raised (no information about them).
+    """
+    suffix = get_market_config(market)["suffix"]
+    frames = {}
+    failed = set()
+    for chunk_start in range(0, len(symbols), BATCH_CHUNK_SIZE):
+        chunk = symbols[chunk_start:chunk_start + BATCH_CHUNK_SIZE]
+        tickers = [f"{symbol}{suffix}" for symbol in chunk]
+        try:
+            data = yf.download(
+                tickers, group_by="ticker", auto_adjust=True, actions=True,
+                ignore_tz=False, threads=True, progress=False, **kwargs,
+            )
+        except Exception:
+            logger.warning("Batch download failed for %d %s tickers", len(tickers), market,
+                           exc_info=True)
+            failed.update(chunk)
+            continue
+        if data is None or data.empty:
+            continue
+
+        for symbol, ticker_symbol in zip(chunk, tickers):
+            if isinstance(data.columns, pd.MultiIndex):
+                if ticker_symbol not in data.columns.get_level_values(0):
+                    continue
+                df = data[ticker_symbol]
+            else:
+                df = data
+            df = df.dropna(subset=["Close"])
+            if not df.empty:
+                frames[symbol] = df
+    return frames, failed
+
+
+def fetch_stock_financials(symbol: str, market: str = "IN") -> FinancialsBundle:
+    """Fetch info and annual/quarterly financial statements for a stock.
+
+    The statements are downloaded eagerly and in parallel, and info is the
+    same cached dict fetch_stock_info returns, so the bundle needs no
+    further network access once returned. Statements stored by an earlier
+    session are reused while Yahoo's fiscal-period markers are unchanged
+    (see core.statement_store).
 
     Args:
         symbol: Stock ticker (e.g. "RELIANCE", "AAPL").
         market: Market code ("IN" for NSE, "US" for US stocks).
 
     Returns:
-        yfinance Ticker object.
+        FinancialsBundle with info and statement DataFrames.
 
     Raises:
         ValueError: If no data is found for the symbol.
     """
-    cached = cache.get("stock_financials", symbol, market)
-    if cached is not None:
-        return cached
+    def load():
+        config = get_market_config(market)
+        suffix = config["suffix"]
+        ticker_symbol = f"{symbol}{suffix}"
+        info = fetch_stock_info(symbol, market=market)
+        marker = statement_store.fiscal_marker(info)
+        statements = statement_store.load(symbol, market, marker)
+        if statements is None:
+            futures = {name: _statement_pool.submit(_fetch_statement, ticker_symbol, name)
+                       for name in _STATEMENTS}
+            statements = {name: f.result() for name, f in futures.items()}
+            # Don't pin an empty response for days; retry it next session
+            if not all(st.empty for st in statements.values()):
+                statement_store.save(symbol, market, marker, statements)
+        else:
+            logger.debug("Statements unchanged for %s — reusing stored copy", ticker_symbol)
+        return FinancialsBundle(info=info, **statements)
 
-    config = get_market_config(market)
-    suffix = config["suffix"]
-    ticker_symbol = f"{symbol}{suffix}"
-    ticker = yf.Ticker(ticker_symbol)
-    info = ticker.info
-    if not info or info.get("regularMarketPrice") is None:
-        raise ValueError(f"No data found for {ticker_symbol}. Check the ticker symbol.")
+    return _cached_fetch("stock_financials", symbol, market, load)
 
-    cache.set("stock_financials", symbol, market, ticker)
-    return ticker
+
+def _fetch_statement(ticker_symbol: str, name: str) -> Statement:
+    """Download and normalize one statement; each gets its own Ticker so no lazy state is shared across threads."""
+    return normalize(getattr(yf.Ticker(ticker_symbol), name))
 
 
 def fetch_stock_info(symbol: str, market: str = "IN") -> dict:
@@ -77,17 +394,37 @@ def fetch_stock_info(symbol: str, market: str = "IN") -> dict:
     Raises:
         ValueError: If info cannot be retrieved.
     """
-    cached = cache.get("stock_info", symbol, market)
-    if cached is not None:
-        return cached
+    def load():
+        config = get_market_config(market)
+        suffix = config["suffix"]
+        ticker_symbol = f"{symbol}{suffix}"
+        ticker = yf.Ticker(ticker_symbol)
+        info = ticker.info
+        if not info or info.get("regularMarketPrice") is None:
+            raise ValueError(f"No info found for {ticker_symbol}. Check the ticker symbol.")
+        return info
 
-    config = get_market_config(market)
-    suffix = config["suffix"]
-    ticker_symbol = f"{symbol}{suffix}"
-    ticker = yf.Ticker(ticker_symbol)
-    info = ticker.info
-    if not info or info.get("regularMarketPrice") is None:
-        raise ValueError(f"No info found for {ticker_symbol}. Check the ticker symbol.")
+    return _cached_fetch("stock_info", symbol, market, load)
+
+
+def fetch_index_data(index_symbol: str, market: str = "IN", period: str = "6mo") -> pd.DataFrame:
+    """Fetch historical data for a market index (e.g. "^NSEI", "^GSPC").
+
+    Args:
+        index_symbol: Yahoo index ticker, used as-is (no market suffix).
+        market: Market code the index belongs to (drives cache expiry).
+        period: yfinance period string.
+
+    Returns:
+        DataFrame with Date index and OHLCV columns.
+
+    Raises:
+        ValueError: If no data is found for the index.
+    """
+    def load():
+        df = yf.Ticker(index_symbol).history(period=period)
+        if df.empty:
+            raise ValueError(f"No data found for index {index_symbol}.")
+        return df
 
-    cache.set("stock_info", symbol, market, info)
-    return info
+    return _cached_fetch("index_data", index_symbol, market, load, period=period)
@@ -1,95 +1,150 @@
-"""MongoDB persistence for group analysis snapshots (async via motor)."""
+"""Persistence for group analysis snapshots and per-symbol metrics (async).
+
+The storage backend is chosen by SNAPSHOT_STORE:
+    mongo   — MongoDB via motor (requires MONGODB_URI)
+    sqlite  — local SQLite file at SNAPSHOT_SQLITE_PATH
+              (default: <project>/data/snapshots.sqlite3)
+
+Without SNAPSHOT_STORE, MongoDB is used when MONGODB_URI is set and SQLite
+otherwise, so development and CI runs persist snapshots fully offline.
+"""
 
 from __future__ import annotations
 
 import logging
 import os
-from datetime import datetime, timezone
+from pathlib import Path
 
 from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
-from pymongo import DESCENDING
-from pymongo.server_api import ServerApi
+
+from core.snapshot_stores import MongoSnapshotStore, SnapshotStore, SQLiteSnapshotStore
 
 load_dotenv()
 logger = logging.getLogger(__name__)
 
-_client: AsyncIOMotorClient | None = None
-_db = None
-
+_store: SnapshotStore | None = None
 
-def _get_db():
-    """Lazy singleton async MongoDB connection."""
-    global _client, _db
-    if _db is not None:
-        return _db
 
+def _create_store() -> SnapshotStore:
     uri = os.getenv("MONGODB_URI")
-    if not uri:
-        logger.warning("MONGODB_URI not set — snapshot persistence disabled")
-        return None
-
-    _client = AsyncIOMotorClient(uri, server_api=ServerApi("1"))
-    _db = _client["stock_analyze"]
-    return _db
+    kind = os.getenv("SNAPSHOT_STORE", "mongo" if uri else "sqlite").lower()
+    if kind == "mongo":
+        if not uri:
+            raise RuntimeError("SNAPSHOT_STORE=mongo requires MONGODB_URI")
+        from motor.motor_asyncio import AsyncIOMotorClient
+        from pymongo.server_api import ServerApi
+
+        client = AsyncIOMotorClient(uri, server_api=ServerApi("1"))
+        logger.info("Snapshot store: MongoDB")
+        return MongoSnapshotStore(client["stock_analyze"])
+    if kind == "sqlite":
+        path = Path(os.getenv(
+            "SNAPSHOT_SQLITE_PATH",
+            Path(__file__).resolve().parent.parent / "data" / "snapshots.sqlite3",
+        ))
+        logger.info("Snapshot store: SQLite at %s", path)
+        return SQLiteSnapshotStore(path)
+    raise ValueError(f"Unknown SNAPSHOT_STORE: {kind!r} (expected 'mongo' or 'sqlite')")
+
+
+def _get_store() -> SnapshotStore:
+    """Lazy singleton snapshot store."""
+    global _store
+    if _store is None:
+        _store = _create_store()
+    return _store
 
 
 async def ensure_indexes():
-    """Create indexes (call once at app startup)."""
-    db = _get_db()
-    if db is None:
-        return
-    await db["group_snapshots"].create_index(
-        [("group_id", 1), ("market", 1), ("session_date", 1)],
-        unique=True,
-    )
+    """Create tables/indexes (call once at app startup)."""
+    await _get_store().ensure_schema()
 
 
 async def save_snapshot(group_id: str, market: str, session_date: str,
                         symbols: list[str], rankings: list[dict]):
     """Upsert a group analysis snapshot keyed by (group_id, market, session_date)."""
-    db = _get_db()
-    if db is None:
-        return
-
-    now = datetime.now(timezone.utc)
-    await db["group_snapshots"].update_one(
-        {"group_id": group_id, "market": market, "session_date": session_date},
-        {"$set": {
-            "symbols": symbols,
-            "rankings": rankings,
-            "updated_at": now,
-        }, "$setOnInsert": {
-            "created_at": now,
-        }},
-        upsert=True,
-    )
+    await _get_store().save_snapshots([{
+        "group_id": group_id,
+        "market": market,
+        "session_date": session_date,
+        "symbols": symbols,
+        "rankings": rankings,
+    }])
     logger.info("Snapshot saved: %s / %s / %s (%d rankings)",
                 group_id, market, session_date, len(rankings))
 
 
-async def get_snapshot(group_id: str, market: str, session_date: str) -> dict | None:
-    """Fetch a single snapshot. Returns None if not found or DB unavailable."""
-    db = _get_db()
-    if db is None:
-        return None
+async def save_snapshots(snapshots: list[dict]):
+    """Upsert many snapshots in one batch (a single transaction on SQLite).
 
-    doc = await db["group_snapshots"].find_one(
-        {"group_id": group_id, "market": market, "session_date": session_date},
-        {"_id": 0},
-    )
-    return doc
+    Each snapshot is a dict with group_id, market, session_date, symbols and
+    rankings; use this when backfilling many groups or sessions at once.
+    """
+    if not snapshots:
+        return
+    await _get_store().save_snapshots(snapshots)
+    logger.info("Snapshots saved: %d", len(snapshots))
+
+
+async def get_snapshot(group_id: str, market: str, session_date: str) -> dict | None:
+    """Fetch a single snapshot. Returns None if not found."""
+    return await _get_store().get_snapshot(group_id, market, session_date)
 
 
 async def list_snapshot_dates(group_id: str, market: str) -> list[str]:
     """Return available session dates (descending) for a group+market."""
-    db = _get_db()
-    if db is None:
-        return []
+    return await _get_store().list_snapshot_dates(group_id, market)
+
+
+async def get_rank_changes(group_id: str, market: str, from_date: str, to_date: str) -> list[dict]:
+    """Rank of every symbol in two snapshots of a group, with the change between them.
+
+    Only symbol and rank leave the database. Rows are sorted by the rank on
+    to_date (symbols that dropped out last); "change" is positive when the
+    symbol moved up, and None if it is missing from either snapshot.
+    """
+    return await _get_store().get_rank_changes(group_id, market, from_date, to_date)
+
+
+async def get_rank_trajectory(group_id: str, market: str, symbol: str) -> list[dict]:
+    """A symbol's ranking entry in every snapshot of a group, oldest first.
+
+    Each point carries session_date, rank, combined_score, earnings_yield
+    and roic; snapshots not containing the symbol are skipped.
+    """
+    return await _get_store().get_rank_trajectory(group_id, market, symbol)
+
+
+async def get_symbol_metric_history(market: str, symbols: list[str], until: str,
+                                    limit: int = 2) -> dict[str, list[dict]]:
+    """Return each symbol's stored metrics for up to `limit` sessions on or before `until`.
+
+    Result: {symbol: [{"session_date", "metrics", "fingerprint"}, ...]}, newest
+    first. Symbols never computed are absent; metrics of None mean the symbol
+    lacked data in that session.
+    """
+    if not symbols:
+        return {}
+    return await _get_store().get_symbol_metric_history(market, symbols, until, limit)
+
+
+async def save_symbol_metrics(market: str, session_date: str, entries: dict[str, dict]):
+    """Bulk upsert per-symbol entries ({"metrics": dict | None, "fingerprint": dict | None}) for a session."""
+    if not entries:
+        return
+    await _get_store().save_symbol_metrics(market, session_date, entries)
+    logger.debug("Symbol metrics saved: %s / %s (%d symbols)", market, session_date, len(entries))
+
+
+async def claim_lease(name: str, ttl: float) -> bool:
+    """Take a named lease for ttl seconds, shared by every process using the store.
+
+    Returns False while another holder's lease is live. A holder that dies
+    without releasing it blocks the name until the lease expires.
+    """
+    return await _get_store().claim_lease(name, ttl)
 
-    cursor = db["group_snapshots"].find(
-        {"group_id": group_id, "market": market},
-        {"session_date": 1, "_id": 0},
-    ).sort("session_date", DESCENDING)
 
-    return [d["session_date"] async for d in cursor]
+async def release_lease(name: str):
+    """Give up a lease taken with claim_lease."""
+    await _get_store().release_lease(name)
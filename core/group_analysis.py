@@ -1,22 +1,17 @@
 """Group-level stock analysis (Magic Formula, etc.)."""
 
+import hashlib
+import json
+import logging
 import math
+from datetime import datetime, timezone
 
-from core.data_fetcher import fetch_stock_info, fetch_stock_financials
+from core.data_fetcher import fetch_stock_info, fetch_stock_financials, fetch_stock_data_batch
 from core.markets import get_market_config
+from core.ranking import MagicFormulaTable
+from core import cache, statement_store
 
-
-def _safe_val(series, *labels):
-    """Extract a finite numeric value from a pandas Series, trying multiple label variants."""
-    for label in labels:
-        if label in series.index:
-            try:
-                v = float(series[label])
-                if math.isfinite(v):
-                    return v
-            except (TypeError, ValueError):
-                pass
-    return None
+logger = logging.getLogger(__name__)
 
 
 def _finite(v):
@@ -30,37 +25,53 @@ def _finite(v):
         return None
 
 
+def _latest_close(symbol: str, market: str):
+    """Latest close from already-cached price history (no network), else None."""
+    df = cache.get("stock_data", symbol, market, period="1y")
+    if df is None or df.empty:
+        return None
+    return _finite(df["Close"].iloc[-1])
+
+
+def prefetch_prices(symbols: list[str], market: str = "IN"):
+    """Warm the per-symbol price cache for a group with batched downloads."""
+    try:
+        fetch_stock_data_batch(symbols, period="1y", market=market)
+    except Exception:
+        # Best effort — per-symbol fetches still work without it
+        logger.warning("Price prefetch failed for %d %s symbols", len(symbols), market, exc_info=True)
+
+
 def _compute_magic_formula_metrics(symbol: str, market: str = "IN"):
     """Compute Earnings Yield and ROIC for a single stock.
 
-    Returns dict with metrics or None if insufficient data.
+    Returns dict with metrics or None if insufficient data. Network and
+    other unexpected errors propagate so the caller can retry.
     """
-    config = get_market_config(market)
-    cur = config["currency"]
-
     try:
-        ticker = fetch_stock_financials(symbol, market=market)
-    except (ValueError, Exception):
+        bundle = fetch_stock_financials(symbol, market=market)
+    except ValueError:
         return None
+    return _metrics_from_inputs(symbol, market, bundle.info, _statement_inputs(bundle))
 
-    info = ticker.info
-    financials = ticker.financials
-    balance = ticker.balance_sheet
 
-    if financials is None or financials.empty or balance is None or balance.empty:
-        return None
+def _statement_inputs(bundle) -> dict | None:
+    """The statement-derived inputs of the metrics: EBIT and invested capital.
+
+    Returns None if the statements are insufficient.
+    """
+    financials = bundle.financials
+    balance = bundle.balance_sheet
 
-    # Most recent annual data
-    fin = financials.iloc[:, 0]
-    bal = balance.iloc[:, 0]
+    if financials.empty or balance.empty:
+        return None
 
-    # --- EBIT ---
-    ebit = _safe_val(fin, "EBIT", "Operating Income")
+    # --- EBIT (most recent annual data) ---
+    ebit = financials.get("EBIT")
     if ebit is None:
-        total_revenue = _safe_val(fin, "Total Revenue", "Operating Revenue")
-        cost_of_revenue = _safe_val(fin, "Cost Of Revenue", "Cost Of Goods Sold")
-        operating_expense = _safe_val(fin, "Operating Expense", "Total Operating Expenses",
-                                      "Selling General And Administration")
+        total_revenue = financials.get("Total Revenue")
+        cost_of_revenue = financials.get("Cost Of Revenue")
+        operating_expense = financials.get("Operating Expense")
         if total_revenue is not None and cost_of_revenue is not None:
             gross_profit = total_revenue - cost_of_revenue
             if operating_expense is not None:
@@ -72,15 +83,10 @@ def _compute_magic_formula_metrics(symbol: str, market: str = "IN"):
     if ebit is None:
         return None
 
-    # --- Enterprise Value ---
-    ev = _finite(info.get("enterpriseValue"))
-    if not ev or ev <= 0:
-        return None
-
     # --- Invested Capital (Net Working Capital + Net Fixed Assets) ---
-    current_assets = _safe_val(bal, "Current Assets", "Total Current Assets")
-    current_liabilities = _safe_val(bal, "Current Liabilities", "Total Current Liabilities")
-    total_assets = _safe_val(bal, "Total Assets")
+    current_assets = balance.get("Current Assets")
+    current_liabilities = balance.get("Current Liabilities")
+    total_assets = balance.get("Total Assets")
 
     if current_assets is None or current_liabilities is None or total_assets is None:
         return None
@@ -92,12 +98,28 @@ def _compute_magic_formula_metrics(symbol: str, market: str = "IN"):
     if invested_capital <= 0:
         return None
 
+    return {"ebit": ebit, "invested_capital": invested_capital}
+
+
+def _metrics_from_inputs(symbol: str, market: str, info: dict, inputs: dict | None):
+    """Metrics from statement-derived inputs and the current info (price, EV); None if insufficient."""
+    if inputs is None:
+        return None
+
+    cur = get_market_config(market)["currency"]
+
+    # --- Enterprise Value ---
+    ev = _finite(info.get("enterpriseValue"))
+    if not ev or ev <= 0:
+        return None
+
     # --- Metrics ---
-    earnings_yield = ebit / ev
-    roic = ebit / invested_capital
+    earnings_yield = inputs["ebit"] / ev
+    roic = inputs["ebit"] / inputs["invested_capital"]
 
     # Extra info for display
-    price = _finite(info.get("regularMarketPrice")) or _finite(info.get("currentPrice"))
+    price = (_finite(info.get("regularMarketPrice")) or _finite(info.get("currentPrice"))
+             or _latest_close(symbol, market))
     market_cap = _finite(info.get("marketCap"))
     pe = _finite(info.get("trailingPE"))
     name = info.get("shortName") or info.get("longName") or symbol
@@ -126,6 +148,144 @@ def _compute_magic_formula_metrics(symbol: str, market: str = "IN"):
     }
 
 
+# Statements and info fields the magic formula metrics are derived from
+_MAGIC_FORMULA_STATEMENTS = ("financials", "balance_sheet")
+_MAGIC_FORMULA_INFO = ("enterpriseValue", "regularMarketPrice", "currentPrice", "marketCap",
+                       "trailingPE", "shortName", "longName")
+
+
+def _market_inputs_hash(info: dict) -> str:
+    inputs = json.dumps([info.get(k) for k in _MAGIC_FORMULA_INFO], default=str)
+    return hashlib.sha1(inputs.encode()).hexdigest()
+
+
+def magic_formula_fingerprint(bundle) -> dict:
+    """What the magic formula metrics of a stock are derived from.
+
+    The statement side is kept apart from the price side, which changes
+    every session:
+        statements: digest per statement, so a change report can say which
+            one changed.
+        fiscal_marker: Yahoo's latest fiscal period dates; while they are
+            unchanged the statements are taken to be too.
+        statement_inputs: EBIT and invested capital derived from the
+            statements (None if insufficient), so a price-only change
+            recomputes the metrics without them.
+        statements_checked: When the statements were last digested.
+        market_inputs: One hash of the price-dependent info fields.
+    """
+    digests = bundle.digests
+    marker = statement_store.fiscal_marker(bundle.info)
+    return {
+        "statements": {name: digests[name] for name in _MAGIC_FORMULA_STATEMENTS},
+        "fiscal_marker": list(marker) if marker is not None else None,
+        "statement_inputs": _statement_inputs(bundle),
+        "statements_checked": datetime.now(timezone.utc).isoformat(),
+        "market_inputs": _market_inputs_hash(bundle.info),
+    }
+
+
+def _statements_unchanged(previous: dict | None, info: dict) -> bool:
+    """Whether a previous fingerprint's statement side still holds, judged from info alone.
+
+    Like core.statement_store, this trusts the fiscal marker for up to
+    STATEMENT_MAX_AGE_DAYS, which catches restatements that keep it.
+    """
+    fingerprint = (previous or {}).get("fingerprint") or {}
+    marker = statement_store.fiscal_marker(info)
+    if marker is None or "statement_inputs" not in fingerprint:
+        return False
+    if fingerprint.get("fiscal_marker") != list(marker):
+        return False
+    try:
+        checked = datetime.fromisoformat(fingerprint["statements_checked"])
+    except (KeyError, TypeError, ValueError):
+        return False
+    return datetime.now(timezone.utc) - checked <= statement_store.MAX_AGE
+
+
+def session_metrics(symbol: str, market: str = "IN", previous: dict | None = None) -> dict:
+    """Magic formula metrics for this session, re-derived only as far as their inputs changed.
+
+    While the statements are unchanged (see _statements_unchanged) they
+    aren't loaded at all: unchanged price inputs reuse the previous
+    metrics, and changed ones recompute them from the stored EBIT and
+    invested capital. Otherwise the statements are fetched and the metrics
+    derived from scratch.
+
+    Args:
+        previous: The symbol's stored entry from an earlier session
+            ({"metrics": ..., "fingerprint": ...}), if any.
+
+    Returns:
+        {"metrics": dict | None, "fingerprint": dict, "reused": bool}, where
+        reused means the statements weren't re-derived. metrics is None
+        only when the statements are insufficient.
+
+    Raises:
+        ValueError: If the stock's data couldn't be fetched. Yahoo returns
+            empty info when rate limiting, so unlike insufficient statements
+            this isn't a result to remember for the session; the caller
+            retries it or leaves the symbol out.
+    """
+    info = fetch_stock_info(symbol, market=market)
+    if _statements_unchanged(previous, info):
+        fingerprint = {**previous["fingerprint"], "market_inputs": _market_inputs_hash(info)}
+        if fingerprint["market_inputs"] == previous["fingerprint"].get("market_inputs"):
+            metrics = previous.get("metrics")
+        else:
+            metrics = _metrics_from_inputs(symbol, market, info, fingerprint["statement_inputs"])
+        return {"metrics": metrics, "fingerprint": fingerprint, "reused": True}
+
+    bundle = fetch_stock_financials(symbol, market=market)
+    fingerprint = magic_formula_fingerprint(bundle)
+    return {"metrics": _metrics_from_inputs(symbol, market, bundle.info, fingerprint["statement_inputs"]),
+            "fingerprint": fingerprint, "reused": False}
+
+
+def symbol_changes(symbols: list[str], history: dict[str, list[dict]]) -> list[dict]:
+    """Compare each symbol's two most recent stored sessions.
+
+    Args:
+        history: {symbol: [entry, ...]} newest first, as returned by
+            core.db.get_symbol_metric_history.
+
+    Returns:
+        One row per symbol with "status" ("changed", "unchanged", "new" or
+        "missing"), the sessions compared, which statements changed, whether
+        the price-dependent inputs changed, and earnings yield / ROIC before
+        and after.
+    """
+    rows = []
+    for symbol in symbols:
+        entries = history.get(symbol, [])
+        if not entries:
+            rows.append({"symbol": symbol, "status": "missing"})
+            continue
+
+        current = entries[0]
+        row = {"symbol": symbol, "session_date": current["session_date"],
+               "previous_session": None, "statements_changed": [], "market_inputs_changed": False}
+        if len(entries) < 2:
+            rows.append({**row, "status": "new"})
+            continue
+
+        previous = entries[1]
+        now_fp = current.get("fingerprint") or {}
+        old_fp = previous.get("fingerprint") or {}
+        now_statements = now_fp.get("statements", {})
+        old_statements = old_fp.get("statements", {})
+        row["previous_session"] = previous["session_date"]
+        row["statements_changed"] = [name for name in _MAGIC_FORMULA_STATEMENTS
+                                     if now_statements.get(name) != old_statements.get(name)]
+        row["market_inputs_changed"] = now_fp.get("market_inputs") != old_fp.get("market_inputs")
+        for key in ("earnings_yield", "roic"):
+            row[key] = [(e.get("metrics") or {}).get(key) for e in (previous, current)]
+        changed = row["statements_changed"] or row["market_inputs_changed"]
+        rows.append({**row, "status": "changed" if changed else "unchanged"})
+    return rows
+
+
 def magic_formula(symbols: list[str], market: str = "IN"):
     """Run Magic Formula ranking on a list of stocks.
 
@@ -135,10 +295,15 @@ def magic_formula(symbols: list[str], market: str = "IN"):
         {"type": "result", "rankings": [...]}
     """
     total = len(symbols)
-    stock_data = []
+    table = MagicFormulaTable()
+    prefetch_prices(symbols, market=market)
 
     for i, symbol in enumerate(symbols, 1):
-        metrics = _compute_magic_formula_metrics(symbol, market=market)
+        try:
+            metrics = _compute_magic_formula_metrics(symbol, market=market)
+        except Exception:
+            logger.warning("Magic formula metrics failed for %s", symbol, exc_info=True)
+            metrics = None
         status = "ok" if metrics else "skipped"
 
         yield {
@@ -150,44 +315,6 @@ def magic_formula(symbols: list[str], market: str = "IN"):
         }
 
         if metrics:
-            stock_data.append(metrics)
-
-    if not stock_data:
-        yield {"type": "result", "rankings": []}
-        return
-
-    # Rank by Earnings Yield (higher = better → lower rank number)
-    stock_data.sort(key=lambda x: x["earnings_yield"], reverse=True)
-    for rank, s in enumerate(stock_data, 1):
-        s["ey_rank"] = rank
-
-    # Rank by ROIC (higher = better → lower rank number)
-    stock_data.sort(key=lambda x: x["roic"], reverse=True)
-    for rank, s in enumerate(stock_data, 1):
-        s["roic_rank"] = rank
-
-    # Combined rank (lower = better)
-    for s in stock_data:
-        s["combined_rank"] = s["ey_rank"] + s["roic_rank"]
-
-    # Sort by combined rank
-    stock_data.sort(key=lambda x: x["combined_rank"])
-
-    # Assign final rank
-    rankings = []
-    for rank, s in enumerate(stock_data, 1):
-        rankings.append({
-            "rank": rank,
-            "symbol": s["symbol"],
-            "name": s["name"],
-            "earnings_yield": round(s["earnings_yield"] * 100, 2),
-            "roic": round(s["roic"] * 100, 2),
-            "ey_rank": s["ey_rank"],
-            "roic_rank": s["roic_rank"],
-            "combined_score": s["combined_rank"],
-            "price": round(s["price"], 2) if s["price"] else None,
-            "market_cap": s["market_cap"],
-            "pe": round(s["pe"], 2) if s["pe"] else None,
-        })
-
-    yield {"type": "result", "rankings": rankings}
+            table.add(metrics, position=i - 1)
+
+    yield {"type": "result", "rankings": table.rank()}
@@ -0,0 +1,250 @@
+"""Vectorized technical indicators computed in a single NumPy pass.
+
+Every primitive takes 2-D float arrays shaped (dates, symbols), so the same
+code serves one stock (a single column) and a whole panel of stocks at once.
+Definitions follow the `ta` library formulas the analysis generators used
+before (Wilder smoothing for RSI/ATR/ADX, adjust=False EMAs for MACD).
+
+Leading NaNs in a column (e.g. a stock listed after the panel start) are
+skipped: each column's smoothing starts at its own first valid bar.
+"""
+
+import numpy as np
+import pandas as pd
+
+from core.data_fetcher import fetch_stock_data
+from core import cache
+
+
+def _window_sum(a: np.ndarray, window: int) -> tuple[np.ndarray, np.ndarray]:
+    """Trailing-window sums of the valid values and counts of valid values."""
+    valid = ~np.isnan(a)
+    sums = np.cumsum(np.where(valid, a, 0.0), axis=0)
+    counts = np.cumsum(valid, axis=0)
+    sums[window:] = sums[window:] - sums[:-window]
+    counts[window:] = counts[window:] - counts[:-window]
+    return sums, counts
+
+
+def sma(a: np.ndarray, window: int) -> np.ndarray:
+    """Simple moving average; NaN until a full window of valid values exists."""
+    sums, counts = _window_sum(a, window)
+    return np.where(counts == window, sums / window, np.nan)
+
+
+def rolling_std(a: np.ndarray, window: int) -> np.ndarray:
+    """Population standard deviation (ddof=0), as used by Bollinger Bands."""
+    # Centre each column first so the sum-of-squares form doesn't lose precision
+    with np.errstate(invalid="ignore"):
+        centred = a - np.nanmean(a, axis=0)
+    mean = sma(centred, window)
+    mean_sq = sma(centred * centred, window)
+    return np.sqrt(np.maximum(mean_sq - mean * mean, 0.0))
+
+
+def _rolling_extreme(a: np.ndarray, window: int, pick) -> np.ndarray:
+    out = np.full(a.shape, np.nan)
+    n = a.shape[0]
+    if n >= window:
+        acc = a[window - 1:].copy()
+        for lag in range(1, window):
+            acc = pick(acc, a[window - 1 - lag:n - lag])
+        out[window - 1:] = acc
+    return out
+
+
+def rolling_min(a: np.ndarray, window: int) -> np.ndarray:
+    return _rolling_extreme(a, window, np.minimum)
+
+
+def rolling_max(a: np.ndarray, window: int) -> np.ndarray:
+    return _rolling_extreme(a, window, np.maximum)
+
+
+# Rows per closed-form block in _decay_filter; keeps decay**-k well inside float range
+_BLOCK = 64
+
+
+def _decay_filter(b: np.ndarray, decay: float) -> np.ndarray:
+    """Solve y[t] = decay * y[t-1] + b[t] (y[-1] = 0) for every column at once.
+
+    Each block of rows is solved in closed form with a cumulative sum, so
+    the only Python loop is over blocks, not bars or symbols.
+    """
+    out = np.empty_like(b)
+    powers = decay ** np.arange(_BLOCK, dtype=float)
+    carry = np.zeros(b.shape[1])
+    for start in range(0, b.shape[0], _BLOCK):
+        block = b[start:start + _BLOCK]
+        p = powers[:len(block), None]
+        y = p * (decay * carry + np.cumsum(block / p, axis=0))
+        out[start:start + _BLOCK] = y
+        carry = y[-1]
+    return out
+
+
+def ewm(a: np.ndarray, alpha: float, min_periods: int) -> np.ndarray:
+    """Exponential moving average with adjust=False semantics, per column.
+
+    Each column starts at its first valid value; gaps after that are
+    forward-filled. Output is NaN until min_periods valid values were seen.
+    """
+    valid = ~np.isnan(a)
+    seen = np.cumsum(valid, axis=0)
+    filled = pd.DataFrame(a).ffill().to_numpy()
+    # Feeding first_value / alpha makes the first output equal first_value exactly
+    b = np.where(seen > 0, alpha * filled, 0.0)
+    first = valid & (seen == 1)
+    b[first] = filled[first]
+    return np.where(seen >= min_periods, _decay_filter(b, 1 - alpha), np.nan)
+
+
+def ema(a: np.ndarray, window: int) -> np.ndarray:
+    return ewm(a, 2 / (window + 1), window)
+
+
+def wilder(a: np.ndarray, window: int) -> np.ndarray:
+    """Wilder smoothing, seeded with the mean of each column's first `window` values.
+
+    Expressed as an adjust=False EWM (alpha = 1/window) whose first input is
+    the seed mean.
+    """
+    valid = ~np.isnan(a)
+    seen = np.cumsum(valid, axis=0)
+    seed_row = valid & (seen == window)
+    seed_sum = np.cumsum(np.where(valid & (seen <= window), a, 0.0), axis=0)
+    x = np.where(seen > window, a, np.nan)
+    x[seed_row] = seed_sum[seed_row] / window
+    return ewm(x, 1 / window, 1)
+
+
+def _shift(a: np.ndarray) -> np.ndarray:
+    out = np.empty_like(a)
+    out[0] = np.nan
+    out[1:] = a[:-1]
+    return out
+
+
+def rsi(close: np.ndarray, window: int = 14) -> np.ndarray:
+    diff = close - _shift(close)
+    up = np.where(diff > 0, diff, 0.0)
+    down = np.where(diff < 0, -diff, 0.0)
+    missing = np.isnan(close)
+    up[missing] = np.nan
+    down[missing] = np.nan
+    ema_up = ewm(up, 1 / window, window)
+    ema_down = ewm(down, 1 / window, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(ema_down == 0, 100.0, 100 - 100 / (1 + ema_up / ema_down))
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    """True range; the first bar of each column falls back to high - low."""
+    prev_close = _shift(close)
+    return np.fmax(high - low, np.fmax(np.abs(high - prev_close), np.abs(low - prev_close)))
+
+
+def adx(high: np.ndarray, low: np.ndarray, close: np.ndarray, window: int = 14) -> np.ndarray:
+    prev_high = _shift(high)
+    prev_low = _shift(low)
+    up = high - prev_high
+    down = prev_low - low
+    plus_dm = np.where((up > down) & (up > 0), up, 0.0)
+    minus_dm = np.where((down > up) & (down > 0), down, 0.0)
+    # Directional movement needs a previous bar, so the first bar of each column is skipped
+    no_prev = np.isnan(prev_high) | np.isnan(high)
+    plus_dm[no_prev] = np.nan
+    minus_dm[no_prev] = np.nan
+    tr = np.where(no_prev, np.nan, true_range(high, low, close))
+
+    smooth_tr = wilder(tr, window)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        plus_di = np.where(smooth_tr != 0, 100 * wilder(plus_dm, window) / smooth_tr, 0.0)
+        minus_di = np.where(smooth_tr != 0, 100 * wilder(minus_dm, window) / smooth_tr, 0.0)
+        di_sum = plus_di + minus_di
+        dx = np.where(di_sum != 0, 100 * np.abs(plus_di - minus_di) / di_sum, 0.0)
+    dx[np.isnan(smooth_tr)] = np.nan
+    return wilder(dx, window)
+
+
+def obv(close: np.ndarray, volume: np.ndarray) -> np.ndarray:
+    """On-balance volume (a flat close counts as an up day, as in `ta`)."""
+    direction = np.where(close < _shift(close), -1.0, 1.0)
+    return np.nancumsum(direction * volume, axis=0)
+
+
+def indicator_arrays(close: np.ndarray, high: np.ndarray, low: np.ndarray,
+                     volume: np.ndarray) -> dict[str, np.ndarray]:
+    """Compute every indicator used by the analysis generators.
+
+    Inputs are 2-D arrays shaped (dates, symbols); each output has the same shape.
+    """
+    ema_12 = ema(close, 12)
+    ema_26 = ema(close, 26)
+    macd_line = ema_12 - ema_26
+    macd_signal = ema(macd_line, 9)
+
+    bb_mid = sma(close, 20)
+    bb_std = rolling_std(close, 20)
+
+    lowest = rolling_min(low, 14)
+    highest = rolling_max(high, 14)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        stoch_k = 100 * (close - lowest) / (highest - lowest)
+
+    return {
+        "sma_20": bb_mid,
+        "sma_50": sma(close, 50),
+        "sma_200": sma(close, 200),
+        "ema_12": ema_12,
+        "ema_26": ema_26,
+        "rsi_14": rsi(close, 14),
+        "stoch_k": stoch_k,
+        "stoch_d": sma(stoch_k, 3),
+        "macd": macd_line,
+        "macd_signal": macd_signal,
+        "macd_hist": macd_line - macd_signal,
+        "adx_14": adx(high, low, close, 14),
+        "atr_14": wilder(true_range(high, low, close), 14),
+        "bb_high": bb_mid + 2 * bb_std,
+        "bb_mid": bb_mid,
+        "bb_low": bb_mid - 2 * bb_std,
+        "volume_sma_20": sma(volume, 20),
+        "obv": obv(close, volume),
+    }
+
+
+def compute_indicators(df: pd.DataFrame) -> pd.DataFrame:
+    """Return the full indicator frame for one OHLCV DataFrame, indexed like df."""
+    def column(name):
+        return df[name].to_numpy(dtype=float).reshape(-1, 1)
+
+    arrays = indicator_arrays(column("Close"), column("High"), column("Low"), column("Volume"))
+    return pd.DataFrame({name: values[:, 0] for name, values in arrays.items()}, index=df.index)
+
+
+def get_indicators(symbol: str, market: str = "IN") -> pd.DataFrame:
+    """Return the memoized indicator frame for a stock's 1y history.
+
+    Cached alongside the price data, so it is computed once per symbol per
+    market session and shared by every analysis generator. The entry is
+    tied to a fingerprint of the price frame it was computed from, so a
+    stale price frame served by the cache never leaves its indicators
+    cached as fresh.
+    """
+    df = fetch_stock_data(symbol, market=market)
+    source = _fingerprint(df)
+    cached = cache.get("indicators", symbol, market, period="1y")
+    if cached is not None and cached[0] == source:
+        return cached[1]
+
+    frame = compute_indicators(df)
+    cache.set("indicators", symbol, market, (source, frame), period="1y")
+    return frame
+
+
+def _fingerprint(df: pd.DataFrame) -> tuple:
+    """Identify a price frame by content; survives the pickling of shared cache backends."""
+    if df.empty:
+        return (0,)
+    return (len(df), df.index[-1], int(pd.util.hash_pandas_object(df["Close"]).sum()))
@@ -1,18 +1,27 @@
+from core.markets import nse, nyse
+from core.markets.trading_calendar import TradingCalendar
+
 MARKET_CONFIG = {
     "IN": {
         "suffix": ".NS",
         "currency": "₹",
         "index": "^NSEI",
         "label": "India (NSE)",
+        "calendar": nse.CALENDAR,
     },
     "US": {
         "suffix": "",
         "currency": "$",
         "index": "^GSPC",
         "label": "US",
+        "calendar": nyse.CALENDAR,
     },
 }
 
 
 def get_market_config(market: str = "IN") -> dict:
     return MARKET_CONFIG.get(market.upper(), MARKET_CONFIG["IN"])
+
+
+def get_calendar(market: str = "IN") -> TradingCalendar:
+    return get_market_config(market)["calendar"]
@@ -0,0 +1,61 @@
+"""NSE (National Stock Exchange of India) trading calendar.
+
+Holidays are from NSE's annual equity-segment holiday circulars. Muhurat
+trading (the one-hour Diwali session) is listed in SHORT_SESSIONS once the
+exchange announces its timing.
+"""
+
+from __future__ import annotations
+
+from datetime import date, time, timedelta
+from zoneinfo import ZoneInfo
+
+from core.markets.trading_calendar import TradingCalendar
+
+HOLIDAYS = frozenset({
+    # 2025
+    date(2025, 2, 26),   # Mahashivratri
+    date(2025, 3, 14),   # Holi
+    date(2025, 3, 31),   # Id-ul-Fitr
+    date(2025, 4, 10),   # Mahavir Jayanti
+    date(2025, 4, 14),   # Dr. Baba Saheb Ambedkar Jayanti
+    date(2025, 4, 18),   # Good Friday
+    date(2025, 5, 1),    # Maharashtra Day
+    date(2025, 8, 15),   # Independence Day
+    date(2025, 8, 27),   # Ganesh Chaturthi
+    date(2025, 10, 2),   # Mahatma Gandhi Jayanti / Dussehra
+    date(2025, 10, 21),  # Diwali Laxmi Pujan
+    date(2025, 10, 22),  # Diwali Balipratipada
+    date(2025, 11, 5),   # Prakash Gurpurb Sri Guru Nanak Dev
+    date(2025, 12, 25),  # Christmas
+    # 2026
+    date(2026, 1, 15),   # Municipal Corporation elections (Maharashtra)
+    date(2026, 1, 26),   # Republic Day
+    date(2026, 3, 3),    # Holi
+    date(2026, 3, 26),   # Shri Ram Navami
+    date(2026, 3, 31),   # Shri Mahavir Jayanti
+    date(2026, 4, 3),    # Good Friday
+    date(2026, 4, 14),   # Dr. Baba Saheb Ambedkar Jayanti
+    date(2026, 5, 1),    # Maharashtra Day
+    date(2026, 5, 28),   # Bakri Id
+    date(2026, 6, 26),   # Muharram
+    date(2026, 9, 14),   # Ganesh Chaturthi
+    date(2026, 10, 2),   # Mahatma Gandhi Jayanti
+    date(2026, 10, 20),  # Dussehra
+    date(2026, 11, 10),  # Diwali Balipratipada
+    date(2026, 11, 24),  # Prakash Gurpurb Sri Guru Nanak Dev
+    date(2026, 12, 25),  # Christmas
+})
+
+SHORT_SESSIONS = {
+    date(2025, 10, 21): time(14, 45),  # Muhurat trading (13:45-14:45)
+}
+
+CALENDAR = TradingCalendar(
+    tz=ZoneInfo("Asia/Kolkata"),
+    close=time(15, 30),
+    # 15:30 close → 16:00 IST boundary
+    settle=timedelta(minutes=30),
+    holidays=HOLIDAYS,
+    short_sessions=SHORT_SESSIONS,
+)
@@ -0,0 +1,66 @@
+"""NYSE trading calendar (also used for NASDAQ-listed stocks, which share its holidays)."""
+
+from __future__ import annotations
+
+from datetime import date, time, timedelta
+from zoneinfo import ZoneInfo
+
+from core.markets.trading_calendar import TradingCalendar
+
+HOLIDAYS = frozenset({
+    # 2025
+    date(2025, 1, 1),    # New Year's Day
+    date(2025, 1, 9),    # National Day of Mourning (President Carter)
+    date(2025, 1, 20),   # Martin Luther King Jr. Day
+    date(2025, 2, 17),   # Washington's Birthday
+    date(2025, 4, 18),   # Good Friday
+    date(2025, 5, 26),   # Memorial Day
+    date(2025, 6, 19),   # Juneteenth
+    date(2025, 7, 4),    # Independence Day
+    date(2025, 9, 1),    # Labor Day
+    date(2025, 11, 27),  # Thanksgiving Day
+    date(2025, 12, 25),  # Christmas Day
+    # 2026
+    date(2026, 1, 1),    # New Year's Day
+    date(2026, 1, 19),   # Martin Luther King Jr. Day
+    date(2026, 2, 16),   # Washington's Birthday
+    date(2026, 4, 3),    # Good Friday
+    date(2026, 5, 25),   # Memorial Day
+    date(2026, 6, 19),   # Juneteenth
+    date(2026, 7, 3),    # Independence Day (observed)
+    date(2026, 9, 7),    # Labor Day
+    date(2026, 11, 26),  # Thanksgiving Day
+    date(2026, 12, 25),  # Christmas Day
+    # 2027
+    date(2027, 1, 1),    # New Year's Day
+    date(2027, 1, 18),   # Martin Luther King Jr. Day
+    date(2027, 2, 15),   # Washington's Birthday
+    date(2027, 3, 26),   # Good Friday
+    date(2027, 5, 31),   # Memorial Day
+    date(2027, 6, 18),   # Juneteenth (observed)
+    date(2027, 7, 5),    # Independence Day (observed)
+    date(2027, 9, 6),    # Labor Day
+    date(2027, 11, 25),  # Thanksgiving Day
+    date(2027, 12, 24),  # Christmas Day (observed)
+})
+
+# Early closes at 1:00 PM ET
+SHORT_SESSIONS = {
+    day: time(13, 0) for day in (
+        date(2025, 7, 3),
+        date(2025, 11, 28),
+        date(2025, 12, 24),
+        date(2026, 11, 27),
+        date(2026, 12, 24),
+        date(2027, 11, 26),
+    )
+}
+
+CALENDAR = TradingCalendar(
+    tz=ZoneInfo("America/New_York"),
+    close=time(16, 0),
+    # 16:00 ET close → 19:00 ET boundary (04:30/05:30 IST)
+    settle=timedelta(hours=3),
+    holidays=HOLIDAYS,
+    short_sessions=SHORT_SESSIONS,
+)
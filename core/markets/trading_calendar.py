@@ -0,0 +1,80 @@
+"""Exchange trading calendars: which days have a session and when it closes.
+
+A market's refresh boundary is its session close plus a settle lag (time
+for Yahoo to publish final bars). Boundaries only exist on trading days,
+so weekends and exchange holidays don't expire cached data, and the
+session date (the trading day of the latest boundary) stays the same
+until the next session actually closes.
+
+Holiday and shortened-session tables are bundled per exchange (nse.py,
+nyse.py). Years beyond the tables fall back to weekends-only closures.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+# Trading days searched backwards/forwards for a boundary; longer than any real closure
+_SEARCH_DAYS = 15
+
+
+@dataclass(frozen=True)
+class TradingCalendar:
+    """Sessions of one exchange.
+
+    Args:
+        tz: Exchange time zone.
+        close: Regular session close (exchange local time).
+        settle: Delay after the close before data counts as final.
+        holidays: Full-day closures.
+        short_sessions: Dates with a non-regular close (half days, and
+            special sessions such as NSE Muhurat trading, which can fall on
+            a holiday or weekend), mapped to their close time.
+    """
+
+    tz: ZoneInfo
+    close: time
+    settle: timedelta
+    holidays: frozenset[date] = field(default_factory=frozenset)
+    short_sessions: dict[date, time] = field(default_factory=dict)
+
+    def is_trading_day(self, day: date) -> bool:
+        if day in self.short_sessions:
+            return True
+        return day.weekday() < 5 and day not in self.holidays
+
+    def session_close(self, day: date) -> datetime | None:
+        """Close of the session on that day, or None if the exchange is shut."""
+        if not self.is_trading_day(day):
+            return None
+        return datetime.combine(day, self.short_sessions.get(day, self.close), tzinfo=self.tz)
+
+    def refresh_boundary(self, day: date) -> datetime | None:
+        """When that day's data becomes final, or None if it isn't a trading day."""
+        close = self.session_close(day)
+        return close + self.settle if close else None
+
+    def last_session(self, now: datetime) -> date:
+        """Trading day of the most recent boundary at or before now."""
+        day = now.astimezone(self.tz).date()
+        for _ in range(_SEARCH_DAYS):
+            boundary = self.refresh_boundary(day)
+            if boundary is not None and boundary <= now:
+                return day
+            day -= timedelta(days=1)
+        raise RuntimeError(f"No trading session within {_SEARCH_DAYS} days before {now}")
+
+    def last_boundary(self, now: datetime) -> datetime:
+        return self.refresh_boundary(self.last_session(now))
+
+    def next_boundary(self, after: datetime) -> datetime:
+        """First boundary strictly after the given time."""
+        day = after.astimezone(self.tz).date()
+        for _ in range(_SEARCH_DAYS):
+            boundary = self.refresh_boundary(day)
+            if boundary is not None and boundary > after:
+                return boundary
+            day += timedelta(days=1)
+        raise RuntimeError(f"No trading session within {_SEARCH_DAYS} days after {after}")
@@ -0,0 +1,115 @@
+"""On-disk OHLCV history, one Parquet file per symbol+market.
+
+History survives restarts, so a stale in-memory cache entry only needs the
+bars after the last stored date instead of a full re-download.
+
+Files live under OHLCV_STORE_DIR (default: <project>/data/ohlcv) as
+<MARKET>/<SYMBOL>.parquet and are replaced atomically on every write.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import tempfile
+from pathlib import Path
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = Path(os.getenv(
+    "OHLCV_STORE_DIR",
+    Path(__file__).resolve().parent.parent / "data" / "ohlcv",
+))
+
+# A stored history "covers" a period if its first bar is within this slack of
+# the period start (weekends and holidays mean the exact start date often has no bar).
+COVERAGE_SLACK = pd.Timedelta(days=7)
+
+_PERIOD_RE = re.compile(r"^(\d+)(d|wk|mo|y)$")
+_PERIOD_UNITS = {"d": "days", "wk": "weeks", "mo": "months", "y": "years"}
+
+
+def period_start(period: str, now: pd.Timestamp | None = None) -> pd.Timestamp | None:
+    """Return the start timestamp of a yfinance period string, or None if unsupported.
+
+    Only fixed-length periods ("5d", "1wk", "6mo", "1y", ...) are supported;
+    "max" and "ytd" return None and bypass the store.
+    """
+    match = _PERIOD_RE.match(period)
+    if not match:
+        return None
+    if now is None:
+        now = pd.Timestamp.now(tz="UTC")
+    amount, unit = int(match.group(1)), _PERIOD_UNITS[match.group(2)]
+    return (now - pd.DateOffset(**{unit: amount})).normalize()
+
+
+def _path(symbol: str, market: str) -> Path:
+    safe_symbol = symbol.upper().replace(os.sep, "_")
+    return STORE_DIR / market.upper() / f"{safe_symbol}.parquet"
+
+
+def load(symbol: str, market: str) -> pd.DataFrame | None:
+    """Return the stored history for a symbol, or None if nothing is stored."""
+    path = _path(symbol, market)
+    if not path.exists():
+        return None
+    try:
+        df = pd.read_parquet(path)
+    except Exception:
+        logger.warning("Unreadable OHLCV file %s — ignoring", path, exc_info=True)
+        return None
+    return df if not df.empty else None
+
+
+def save(symbol: str, market: str, df: pd.DataFrame):
+    """Atomically replace the stored history for a symbol."""
+    path = _path(symbol, market)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Unique per write: threads of one process may save the same symbol at once
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp",
+                                     delete=False) as f:
+        df.to_parquet(f)
+    os.replace(f.name, path)
+    logger.debug("OHLCV SAVE  %s/%s (%d bars)", market.upper(), symbol.upper(), len(df))
+
+
+def covers(df: pd.DataFrame, start: pd.Timestamp) -> bool:
+    """True if the stored history reaches back to (roughly) the given start."""
+    first = df.index[0]
+    return first.tz_convert("UTC") <= start.tz_convert("UTC") + COVERAGE_SLACK
+
+
+def merge(stored: pd.DataFrame | None, fresh: pd.DataFrame) -> pd.DataFrame:
+    """Overlay freshly fetched bars onto stored history.
+
+    Fresh bars win for overlapping dates, so a partial intraday bar stored
+    earlier is replaced by the final one.
+    """
+    if stored is None or stored.empty:
+        return fresh
+    if fresh.empty:
+        return stored
+    fresh = fresh.tz_convert(stored.index.tz)
+    older = stored[stored.index < fresh.index[0]]
+    return pd.concat([older, fresh])
+
+
+def has_corporate_actions(df: pd.DataFrame) -> bool:
+    """True if any bar carries a dividend or split.
+
+    Adjusted prices before such a bar change retroactively, so the stored
+    history must be refetched in full rather than appended to.
+    """
+    for column in ("Dividends", "Stock Splits"):
+        if column in df.columns and (df[column].fillna(0) != 0).any():
+            return True
+    return False
+
+
+def trim(df: pd.DataFrame, start: pd.Timestamp) -> pd.DataFrame:
+    """Return only the bars on or after start."""
+    return df[df.index >= start.tz_convert(df.index.tz)]
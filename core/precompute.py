@@ -0,0 +1,251 @@
+"""Post-close precompute of magic formula rankings for every stock group.
+
+After each market's refresh boundary (a trading session's close, see
+core.markets) plus PRECOMPUTE_DELAY_MINUTES (default 10, giving Yahoo time
+to publish final data), the scheduler prefetches prices and financials for every symbol in
+that market's STOCK_GROUPS, computes per-symbol metrics with bounded
+adaptive concurrency (PRECOMPUTE_CONCURRENCY, default 8), and saves one
+snapshot per group. Daytime group requests are then served from the
+snapshot store. On startup, any market whose current session has no
+snapshot yet is caught up immediately.
+
+Runs inside the web app when PRECOMPUTE_ENABLED is set, or standalone:
+
+    python -m core.precompute           # scheduler loop
+    python -m core.precompute --once    # precompute the current session and exit
+
+Each process runs its own scheduler (every uvicorn worker, plus any
+standalone worker). A scheduled run first claims a lease on the
+market's session in the snapshot store (core.db.claim_lease), so a
+session is computed by whichever process gets there first. The lease
+expires after PRECOMPUTE_LEASE_HOURS (default 2), so a crashed holder
+doesn't block the next attempt for longer than that.
+
+A standalone scheduler (the Procfile's worker) shares snapshots,
+per-symbol metrics and the lease through core.db, so it refuses to start
+unless that store is shared with the web app: MongoDB (MONGODB_URI), or
+SNAPSHOT_STORE=sqlite set explicitly for a SNAPSHOT_SQLITE_PATH both
+processes can reach on one host. The default SQLite file would be private
+to the worker's own dyno, where no user ever reads it. Without a shared
+store, drop the worker and set PRECOMPUTE_ENABLED on the web app instead.
+Set CACHE_BACKEND=sqlite to share the warmed price and financials cache
+with the web processes as well.
+
+session_metric_stream() is the computation pipeline shared with the web
+app's magic formula stream.
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+from contextlib import aclosing
+from datetime import datetime, timedelta
+from typing import AsyncIterator
+
+from core.cache import IST, _last_refresh_boundary, _next_refresh_boundary, current_session_date
+from core.db import (claim_lease, ensure_indexes, get_snapshot, get_symbol_metric_history,
+                     release_lease, save_snapshots, save_symbol_metrics)
+from core.group_analysis import prefetch_prices, session_metrics
+from core.markets import MARKET_CONFIG
+from core.ranking import MagicFormulaTable
+from core.stock_groups import STOCK_GROUPS
+from core.work_queue import run_adaptive
+
+logger = logging.getLogger(__name__)
+
+ENABLED = os.getenv("PRECOMPUTE_ENABLED", "").strip().lower() in ("1", "true", "yes")
+DELAY = timedelta(minutes=float(os.getenv("PRECOMPUTE_DELAY_MINUTES", 10)))
+CONCURRENCY = int(os.getenv("PRECOMPUTE_CONCURRENCY", 8))
+LEASE = timedelta(hours=float(os.getenv("PRECOMPUTE_LEASE_HOURS", 2)))
+
+# Newly computed symbols persisted per write
+SAVE_EVERY = 10
+
+
+async def session_metric_stream(symbols: list[str], market: str, session_date: str, *,
+                                max_concurrency: int | None = None
+                                ) -> AsyncIterator[tuple[int, str, dict | None, bool]]:
+    """Yield (index, symbol, metrics, cached) for every symbol, in completion order.
+
+    Symbols already computed this session (by any basket) come first, with
+    cached=True and no network access. The rest get one batched price
+    download, then session_metrics() on the adaptive work queue, which
+    skips the statements while they are unchanged since the previous
+    session and only recomputes the price-dependent metrics. New
+    results are persisted every SAVE_EVERY symbols and at the end; if the
+    consumer stops early, the unsaved rest is recomputed by the next run.
+    Symbols that fail after retries yield metrics=None and are not
+    remembered for the session. Consume it with contextlib.aclosing so an
+    early stop shuts down the work queue right away.
+    """
+    history = await get_symbol_metric_history(market, symbols, until=session_date)
+    previous = {}
+    pending = []
+    for index, symbol in enumerate(symbols):
+        entries = history.get(symbol, [])
+        if entries and entries[0]["session_date"] == session_date:
+            yield index, symbol, entries[0].get("metrics"), True
+            continue
+        if entries:
+            previous[symbol] = entries[0]
+        pending.append(symbol)
+
+    if not pending:
+        return
+
+    # One multi-ticker price download for the new symbols instead of one per symbol
+    await asyncio.to_thread(prefetch_prices, pending, market)
+
+    positions = {symbol: index for index, symbol in enumerate(symbols)}
+    fresh: dict[str, dict] = {}
+    results = run_adaptive(lambda sym: session_metrics(sym, market, previous.get(sym)), pending,
+                           max_concurrency=max_concurrency)
+    async with aclosing(results):
+        async for result in results:
+            metrics = None
+            if result.error is None:
+                fresh[result.item] = result.value
+                metrics = result.value["metrics"]
+            yield positions[result.item], result.item, metrics, False
+            if len(fresh) >= SAVE_EVERY:
+                await save_symbol_metrics(market, session_date, fresh)
+                fresh = {}
+    # Not in a finally: awaiting while the generator is closed early can fail or be dropped
+    await save_symbol_metrics(market, session_date, fresh)
+
+
+async def precompute_market(market: str, session_date: str | None = None) -> int:
+    """Compute and save snapshots for every group of a market; return the number saved.
+
+    Symbols shared between groups are computed once.
+    """
+    market = market.upper()
+    groups = STOCK_GROUPS.get(market, [])
+    session_date = session_date or current_session_date(market)
+    symbols = list(dict.fromkeys(s for g in groups for s in g["symbols"]))
+    if not symbols:
+        return 0
+
+    started = datetime.now(IST)
+    metrics: dict[str, dict] = {}
+    results = session_metric_stream(symbols, market, session_date, max_concurrency=CONCURRENCY)
+    async with aclosing(results):
+        async for _, symbol, m, _ in results:
+            if m:
+                metrics[symbol] = m
+
+    snapshots = []
+    for group in groups:
+        table = MagicFormulaTable()
+        for position, symbol in enumerate(group["symbols"]):
+            if symbol in metrics:
+                table.add(metrics[symbol], position=position)
+        rankings = table.rank()
+        if rankings:
+            snapshots.append({"group_id": group["id"], "market": market, "session_date": session_date,
+                              "symbols": group["symbols"], "rankings": rankings})
+    await save_snapshots(snapshots)
+
+    logger.info("Precomputed %s session %s: %d/%d symbols, %d groups in %.0fs",
+                market, session_date, len(metrics), len(symbols), len(snapshots),
+                (datetime.now(IST) - started).total_seconds())
+    return len(snapshots)
+
+
+async def _is_warm(market: str, session_date: str) -> bool:
+    for group in STOCK_GROUPS.get(market, []):
+        if await get_snapshot(group["id"], market, session_date) is None:
+            return False
+    return True
+
+
+def _next_run(market: str, now: datetime) -> datetime:
+    """First post-boundary run time for a market that is still in the future."""
+    run_at = _last_refresh_boundary(market, now) + DELAY
+    if run_at <= now:
+        run_at = _next_refresh_boundary(market, now) + DELAY
+    return run_at
+
+
+async def _run_safely(market: str, only_if_cold: bool = False):
+    """Precompute a market's current session unless it's done or another process holds its lease.
+
+    Every error is logged rather than raised, keeping the scheduler alive;
+    the next boundary (or a user request) retries.
+    """
+    session_date = current_session_date(market)
+    lease = f"precompute:{market}:{session_date}"
+    try:
+        if only_if_cold and await _is_warm(market, session_date):
+            return
+        if not await claim_lease(lease, LEASE.total_seconds()):
+            logger.info("Precompute of %s session %s is claimed by another process", market, session_date)
+            return
+    except Exception:
+        logger.exception("Precompute check failed for %s", market)
+        return
+
+    try:
+        await precompute_market(market, session_date)
+    except Exception:
+        logger.exception("Precompute failed for %s", market)
+        try:
+            # Let another process (or a restart) retry without waiting for the lease to lapse
+            await release_lease(lease)
+        except Exception:
+            logger.warning("Could not release precompute lease %s", lease, exc_info=True)
+
+
+async def run_scheduler(markets: list[str] | None = None):
+    """Precompute each market after every refresh boundary, forever (cancel to stop)."""
+    markets = [m.upper() for m in (markets or MARKET_CONFIG)]
+
+    for market in markets:
+        await _run_safely(market, only_if_cold=True)
+
+    while True:
+        now = datetime.now(IST)
+        run_at, market = min((_next_run(m, now), m) for m in markets)
+        logger.info("Next precompute: %s at %s", market, run_at.isoformat())
+        await asyncio.sleep((run_at - now).total_seconds())
+        await _run_safely(market)
+
+
+def _has_shared_store() -> bool:
+    """True if core.db isn't falling back to its default, process-local SQLite file."""
+    return bool(os.getenv("MONGODB_URI")) or os.getenv("SNAPSHOT_STORE", "").strip().lower() == "sqlite"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute magic formula snapshots for all groups.")
+    parser.add_argument("--once", action="store_true", help="precompute the current session and exit")
+    parser.add_argument("--market", action="append", help="market to precompute (repeatable; default all)")
+    args = parser.parse_args()
+    if not args.once and not _has_shared_store():
+        parser.error("the scheduler needs a snapshot store shared with the web app: set MONGODB_URI, "
+                     "or SNAPSHOT_STORE=sqlite with a SNAPSHOT_SQLITE_PATH the web app also uses; "
+                     "otherwise set PRECOMPUTE_ENABLED on the web app instead of running a worker")
+
+    logging.basicConfig(
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+        level=logging.INFO,
+    )
+    markets = [m.upper() for m in (args.market or MARKET_CONFIG)]
+
+    async def run():
+        # A standalone worker may be the first process to use a fresh store
+        await ensure_indexes()
+        if args.once:
+            for market in markets:
+                await precompute_market(market)
+        else:
+            await run_scheduler(markets)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Magic Formula ranking over columnar metrics.
+
+Both the batch generator (core.group_analysis.magic_formula) and the web
+SSE stream feed per-symbol metrics into a MagicFormulaTable, which keeps
+each metric as a column and ranks with NumPy sorts. Ranking can run at any
+point, so callers can publish a provisional top-N while symbols are still
+being fetched.
+
+Ties are broken the way the original list sorts broke them: earnings yield
+ties by input order, ROIC ties by earnings-yield rank, and combined-score
+ties by ROIC rank.
+"""
+
+from __future__ import annotations
+
+import numpy as np
+
+
+class MagicFormulaTable:
+    """Accumulates _compute_magic_formula_metrics results column by column."""
+
+    _NUMERIC = ("earnings_yield", "roic")
+    _DISPLAY = ("symbol", "name", "price", "market_cap", "pe")
+
+    def __init__(self):
+        self._columns: dict[str, list] = {name: [] for name in self._NUMERIC + self._DISPLAY}
+        self._position: list[int] = []
+
+    def __len__(self) -> int:
+        return len(self._position)
+
+    def add(self, metrics: dict, position: int | None = None):
+        """Add one symbol's metrics.
+
+        position is the symbol's index in the requested list; it breaks
+        earnings-yield ties so the result doesn't depend on completion order.
+        """
+        for name, column in self._columns.items():
+            column.append(metrics[name])
+        self._position.append(len(self._position) if position is None else position)
+
+    def rank(self, top: int | None = None) -> list[dict]:
+        """Return rankings (best first) over the metrics added so far, optionally only the top N."""
+        n = len(self)
+        if n == 0:
+            return []
+
+        ey = np.asarray(self._columns["earnings_yield"], dtype=float)
+        roic = np.asarray(self._columns["roic"], dtype=float)
+        position = np.asarray(self._position)
+
+        # Higher is better for both metrics → rank 1 is the largest value
+        ey_rank = np.empty(n, dtype=int)
+        ey_rank[np.lexsort((position, -ey))] = np.arange(1, n + 1)
+        roic_rank = np.empty(n, dtype=int)
+        roic_rank[np.lexsort((ey_rank, -roic))] = np.arange(1, n + 1)
+        combined = ey_rank + roic_rank
+
+        order = np.lexsort((roic_rank, combined))
+        if top is not None:
+            order = order[:top]
+
+        return [self._ranking_row(rank, i, ey_rank, roic_rank, combined)
+                for rank, i in enumerate(order.tolist(), 1)]
+
+    def _ranking_row(self, rank: int, i: int, ey_rank, roic_rank, combined) -> dict:
+        c = self._columns
+        price, pe = c["price"][i], c["pe"][i]
+        return {
+            "rank": rank,
+            "symbol": c["symbol"][i],
+            "name": c["name"][i],
+            "earnings_yield": round(c["earnings_yield"][i] * 100, 2),
+            "roic": round(c["roic"][i] * 100, 2),
+            "ey_rank": int(ey_rank[i]),
+            "roic_rank": int(roic_rank[i]),
+            "combined_score": int(combined[i]),
+            "price": round(price, 2) if price else None,
+            "market_cap": c["market_cap"][i],
+            "pe": round(pe, 2) if pe else None,
+        }
+
@@ -0,0 +1,154 @@
+"""Cross-sectional technical screen over a basket of stocks.
+
+The OHLCV of every symbol is aligned into (dates x symbols) matrices and the
+indicators from core.indicators are computed for all columns at once, so
+screening a whole group costs one vectorized pass instead of one
+technical_analysis run per symbol.
+"""
+
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from core.data_fetcher import fetch_stock_data_batch
+from core.indicators import indicator_arrays
+
+SCREEN_COLUMNS = [
+    {"key": "symbol", "label": "Symbol"},
+    {"key": "price", "label": "Price"},
+    {"key": "change_pct", "label": "Change %"},
+    {"key": "rsi", "label": "RSI (14)"},
+    {"key": "sma_50", "label": "SMA 50"},
+    {"key": "sma_200", "label": "SMA 200"},
+    {"key": "cross", "label": "SMA 50/200"},
+    {"key": "macd_hist", "label": "MACD Hist"},
+    {"key": "adx", "label": "ADX (14)"},
+    {"key": "atr_pct", "label": "ATR %"},
+    {"key": "volume_ratio", "label": "Volume Ratio"},
+    {"key": "score", "label": "Bullish Signals"},
+    {"key": "signal", "label": "Signal"},
+]
+_SORT_KEYS = {c["key"] for c in SCREEN_COLUMNS}
+
+# Same seven signals as the "Overall Signal" section of technical_analysis
+SIGNAL_COUNT = 7
+
+
+def build_panel(frames: dict[str, pd.DataFrame]) -> tuple[pd.Index, list[str], dict[str, np.ndarray]]:
+    """Align per-symbol OHLCV frames into (dates x symbols) float matrices.
+
+    Prices are forward-filled across dates a symbol didn't trade; dates
+    before a symbol's first bar stay NaN.
+
+    Returns:
+        (dates, symbols, {"Close": ..., "High": ..., "Low": ..., "Volume": ...})
+    """
+    symbols = list(frames)
+    matrices = {}
+    dates = None
+    for field in ("Close", "High", "Low", "Volume"):
+        aligned = pd.concat({s: frames[s][field] for s in symbols}, axis=1).sort_index()
+        if field != "Volume":
+            aligned = aligned.ffill()
+        dates = aligned.index
+        matrices[field] = aligned.to_numpy(dtype=float)
+    return dates, symbols, matrices
+
+
+def _value(x, decimals=2):
+    return round(float(x), decimals) if math.isfinite(x) else None
+
+
+def screen_panel(symbols: list[str], matrices: dict[str, np.ndarray]) -> list[dict]:
+    """Compute one screen row per symbol from aligned OHLCV matrices."""
+    close = matrices["Close"]
+    volume = matrices["Volume"]
+    ind = indicator_arrays(close, matrices["High"], matrices["Low"], volume)
+
+    last_close, prev_close = close[-1], close[-2]
+    sma_50, sma_200 = ind["sma_50"][-1], ind["sma_200"][-1]
+    prev_50, prev_200 = ind["sma_50"][-2], ind["sma_200"][-2]
+    rsi = ind["rsi_14"][-1]
+    stoch_k = ind["stoch_k"][-1]
+    macd_hist = ind["macd_hist"][-1]
+    obv = ind["obv"]
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = (last_close - prev_close) / prev_close * 100
+        atr_pct = ind["atr_14"][-1] / last_close * 100
+        volume_ratio = volume[-1] / ind["volume_sma_20"][-1]
+
+    cross = np.select(
+        [(prev_50 <= prev_200) & (sma_50 > sma_200),
+         (prev_50 >= prev_200) & (sma_50 < sma_200),
+         sma_50 > sma_200,
+         sma_50 <= sma_200],
+        ["GOLDEN CROSS", "DEATH CROSS", "SMA 50 > SMA 200", "SMA 50 < SMA 200"],
+        default="N/A",
+    )
+
+    score = (
+        (last_close > sma_50).astype(int)
+        + (last_close > sma_200)
+        + ((rsi > 40) & (rsi < 70))
+        + ((stoch_k >= 20) & (stoch_k <= 80))
+        + (macd_hist > 0)
+        + (last_close > ind["bb_mid"][-1])
+        + (obv[-1] > obv[-5])
+    )
+    signal = np.where(score >= 5, "BULLISH",
+                      np.where(SIGNAL_COUNT - score >= 5, "BEARISH", "NEUTRAL"))
+
+    rows = []
+    for i, symbol in enumerate(symbols):
+        rows.append({
+            "symbol": symbol,
+            "price": _value(last_close[i]),
+            "change_pct": _value(change_pct[i]),
+            "rsi": _value(rsi[i]),
+            "sma_50": _value(sma_50[i]),
+            "sma_200": _value(sma_200[i]),
+            "cross": str(cross[i]),
+            "macd_hist": _value(macd_hist[i], 4),
+            "adx": _value(ind["adx_14"][-1][i]),
+            "atr_pct": _value(atr_pct[i]),
+            "volume_ratio": _value(volume_ratio[i]),
+            "score": int(score[i]),
+            "signal": str(signal[i]),
+        })
+    return rows
+
+
+def technical_screen(symbols: list[str], market: str = "IN", sort: str = "score",
+                     descending: bool = True) -> dict:
+    """Screen a basket of stocks on technical indicators.
+
+    Returns a dict with "columns", "rows" (sorted by `sort`, missing values
+    last), "as_of" and "skipped" (symbols without price data), or an
+    "error" key for an unknown sort column.
+    """
+    if sort not in _SORT_KEYS:
+        return {"error": f"Unknown sort column '{sort}'"}
+
+    frames = {s: df for s, df in fetch_stock_data_batch(symbols, period="1y", market=market).items()
+              if len(df) >= 2}
+    skipped = [s for s in symbols if s not in frames]
+    if not frames:
+        return {"columns": SCREEN_COLUMNS, "rows": [], "as_of": None, "skipped": skipped}
+
+    dates, panel_symbols, matrices = build_panel(frames)
+    rows = screen_panel(panel_symbols, matrices)
+
+    present = [r for r in rows if r[sort] is not None]
+    missing = [r for r in rows if r[sort] is None]
+    present.sort(key=lambda r: r[sort], reverse=descending)
+
+    return {
+        "columns": SCREEN_COLUMNS,
+        "rows": present + missing,
+        "as_of": dates[-1].strftime("%Y-%m-%d"),
+        "skipped": skipped,
+    }
@@ -0,0 +1,53 @@
+"""Coalesce concurrent calls for the same key into a single execution.
+
+While a call for a key is in flight, other callers wait for its result
+instead of starting their own. Callers may be plain threads or coroutines
+going through asyncio.to_thread, which is how the web app reaches the
+fetchers. Exceptions are re-raised in every waiter, and nothing is
+remembered once the call finishes — caching stays the job of core.cache.
+"""
+
+from __future__ import annotations
+
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Callable, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Deduplicates concurrent calls that share a key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, Future] = {}
+
+    def do(self, key: Hashable, fn: Callable, *args, **kwargs):
+        """Run fn(*args, **kwargs) unless a call for key is already running.
+
+        Returns the result of whichever call ran for this key.
+        """
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._calls[key] = future
+
+        if not leader:
+            logger.debug("FLIGHT JOIN %s", key)
+            return future.result()
+
+        try:
+            result = fn(*args, **kwargs)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
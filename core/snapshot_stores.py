@@ -0,0 +1,423 @@
+"""Storage backends for core.db.
+
+    MongoSnapshotStore   — MongoDB via motor (MONGODB_URI).
+    SQLiteSnapshotStore  — embedded SQLite file, works fully offline.
+
+Both store group snapshots (rankings per group, market and session date),
+per-symbol magic formula metrics and expiring leases that let processes
+coordinate work, and implement the same queries. The
+SQLite store also keeps every ranking entry as its own row, so the
+rank-change and trajectory queries are plain indexed SELECTs.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+from abc import ABC, abstractmethod
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotStore(ABC):
+    """Async persistence for snapshots and per-symbol metrics.
+
+    A snapshot is a dict with group_id, market, session_date, symbols and rankings.
+    """
+
+    @abstractmethod
+    async def ensure_schema(self):
+        """Create tables/indexes (call once at app startup)."""
+
+    @abstractmethod
+    async def save_snapshots(self, snapshots: list[dict]):
+        """Upsert many snapshots, keyed by (group_id, market, session_date), in one batch."""
+
+    @abstractmethod
+    async def get_snapshot(self, group_id: str, market: str, session_date: str) -> dict | None:
+        """Return session_date, symbols and rankings of one snapshot, or None."""
+
+    @abstractmethod
+    async def list_snapshot_dates(self, group_id: str, market: str) -> list[str]:
+        """Return available session dates (descending) for a group+market."""
+
+    @abstractmethod
+    async def get_rank_changes(self, group_id: str, market: str, from_date: str,
+                               to_date: str) -> list[dict]:
+        """See core.db.get_rank_changes."""
+
+    @abstractmethod
+    async def get_rank_trajectory(self, group_id: str, market: str, symbol: str) -> list[dict]:
+        """See core.db.get_rank_trajectory."""
+
+    @abstractmethod
+    async def get_symbol_metric_history(self, market: str, symbols: list[str], until: str,
+                                        limit: int) -> dict[str, list[dict]]:
+        """See core.db.get_symbol_metric_history."""
+
+    @abstractmethod
+    async def save_symbol_metrics(self, market: str, session_date: str, entries: dict[str, dict]):
+        """See core.db.save_symbol_metrics."""
+
+    @abstractmethod
+    async def claim_lease(self, name: str, ttl: float) -> bool:
+        """See core.db.claim_lease."""
+
+    @abstractmethod
+    async def release_lease(self, name: str):
+        """See core.db.release_lease."""
+
+
+class MongoSnapshotStore(SnapshotStore):
+    """Collections group_snapshots, symbol_metrics and leases in a motor database."""
+
+    def __init__(self, db):
+        self._db = db
+
+    async def ensure_schema(self):
+        db = self._db
+        await db["group_snapshots"].create_index(
+            [("group_id", 1), ("market", 1), ("session_date", 1)],
+            unique=True,
+        )
+        # Multikey index for per-symbol trajectory queries across a group's snapshots
+        await db["group_snapshots"].create_index(
+            [("group_id", 1), ("market", 1), ("rankings.symbol", 1)],
+        )
+        await db["symbol_metrics"].create_index(
+            [("market", 1), ("session_date", 1), ("symbol", 1)],
+            unique=True,
+        )
+
+    async def save_snapshots(self, snapshots):
+        if not snapshots:
+            return
+        now = datetime.now(timezone.utc)
+        await self._db["group_snapshots"].bulk_write([
+            UpdateOne(
+                {"group_id": s["group_id"], "market": s["market"], "session_date": s["session_date"]},
+                {"$set": {
+                    "symbols": s["symbols"],
+                    "rankings": s["rankings"],
+                    "updated_at": now,
+                }, "$setOnInsert": {
+                    "created_at": now,
+                }},
+                upsert=True,
+            )
+            for s in snapshots
+        ], ordered=False)
+
+    async def get_snapshot(self, group_id, market, session_date):
+        return await self._db["group_snapshots"].find_one(
+            {"group_id": group_id, "market": market, "session_date": session_date},
+            {"_id": 0},
+        )
+
+    async def list_snapshot_dates(self, group_id, market):
+        cursor = self._db["group_snapshots"].find(
+            {"group_id": group_id, "market": market},
+            {"session_date": 1, "_id": 0},
+        ).sort("session_date", DESCENDING)
+        return [d["session_date"] async for d in cursor]
+
+    async def get_rank_changes(self, group_id, market, from_date, to_date):
+        def rank_on(date):
+            return {"$max": {"$cond": [{"$eq": ["$session_date", date]}, "$rankings.rank", None]}}
+
+        pipeline = [
+            {"$match": {"group_id": group_id, "market": market,
+                        "session_date": {"$in": [from_date, to_date]}}},
+            {"$project": {"_id": 0, "session_date": 1, "rankings.symbol": 1, "rankings.rank": 1}},
+            {"$unwind": "$rankings"},
+            {"$group": {"_id": "$rankings.symbol", "from_rank": rank_on(from_date),
+                        "to_rank": rank_on(to_date)}},
+            {"$project": {
+                "_id": 0,
+                "symbol": "$_id",
+                "from_rank": 1,
+                "to_rank": 1,
+                "change": {"$cond": [
+                    {"$and": [{"$ne": ["$from_rank", None]}, {"$ne": ["$to_rank", None]}]},
+                    {"$subtract": ["$from_rank", "$to_rank"]},
+                    None,
+                ]},
+                "missing_to": {"$eq": ["$to_rank", None]},
+            }},
+            {"$sort": {"missing_to": 1, "to_rank": 1, "from_rank": 1}},
+            {"$project": {"missing_to": 0}},
+        ]
+        return [d async for d in self._db["group_snapshots"].aggregate(pipeline)]
+
+    async def get_rank_trajectory(self, group_id, market, symbol):
+        pipeline = [
+            {"$match": {"group_id": group_id, "market": market, "rankings.symbol": symbol}},
+            {"$project": {"_id": 0, "session_date": 1, "entry": {"$arrayElemAt": [
+                {"$filter": {"input": "$rankings", "cond": {"$eq": ["$$this.symbol", symbol]}}}, 0,
+            ]}}},
+            {"$sort": {"session_date": 1}},
+            {"$project": {
+                "session_date": 1,
+                "rank": "$entry.rank",
+                "combined_score": "$entry.combined_score",
+                "earnings_yield": "$entry.earnings_yield",
+                "roic": "$entry.roic",
+            }},
+        ]
+        return [d async for d in self._db["group_snapshots"].aggregate(pipeline)]
+
+    async def get_symbol_metric_history(self, market, symbols, until, limit):
+        pipeline = [
+            {"$match": {"market": market, "symbol": {"$in": symbols}, "session_date": {"$lte": until}}},
+            {"$sort": {"symbol": 1, "session_date": -1}},
+            {"$group": {"_id": "$symbol", "entries": {"$push": {
+                "session_date": "$session_date",
+                "metrics": "$metrics",
+                "fingerprint": "$fingerprint",
+            }}}},
+            {"$project": {"entries": {"$slice": ["$entries", limit]}}},
+        ]
+        return {d["_id"]: d["entries"] async for d in self._db["symbol_metrics"].aggregate(pipeline)}
+
+    async def save_symbol_metrics(self, market, session_date, entries):
+        now = datetime.now(timezone.utc)
+        await self._db["symbol_metrics"].bulk_write([
+            UpdateOne(
+                {"market": market, "session_date": session_date, "symbol": symbol},
+                {"$set": {"metrics": entry.get("metrics"), "fingerprint": entry.get("fingerprint"),
+                          "updated_at": now}},
+                upsert=True,
+            )
+            for symbol, entry in entries.items()
+        ], ordered=False)
+
+    async def claim_lease(self, name, ttl):
+        now = datetime.now(timezone.utc)
+        try:
+            # Matches only an expired lease; otherwise the upsert collides with the live one
+            await self._db["leases"].update_one(
+                {"_id": name, "until": {"$lte": now}},
+                {"$set": {"until": now + timedelta(seconds=ttl)}},
+                upsert=True,
+            )
+        except DuplicateKeyError:
+            return False
+        return True
+
+    async def release_lease(self, name):
+        await self._db["leases"].delete_one({"_id": name})
+
+
+class SQLiteSnapshotStore(SnapshotStore):
+    """Snapshots in a local SQLite database (WAL mode).
+
+    Queries run on worker threads via asyncio.to_thread, each thread with
+    its own connection. Rankings are stored both as the JSON array returned
+    by get_snapshot and as one snapshot_ranks row per symbol for queries.
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS group_snapshots (
+            group_id TEXT NOT NULL,
+            market TEXT NOT NULL,
+            session_date TEXT NOT NULL,
+            symbols TEXT NOT NULL,
+            rankings TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (group_id, market, session_date)
+        );
+        CREATE TABLE IF NOT EXISTS snapshot_ranks (
+            group_id TEXT NOT NULL,
+            market TEXT NOT NULL,
+            session_date TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            rank INTEGER,
+            combined_score INTEGER,
+            earnings_yield REAL,
+            roic REAL,
+            PRIMARY KEY (group_id, market, session_date, symbol)
+        );
+        CREATE INDEX IF NOT EXISTS snapshot_ranks_symbol
+            ON snapshot_ranks (group_id, market, symbol, session_date);
+        CREATE TABLE IF NOT EXISTS symbol_metrics (
+            market TEXT NOT NULL,
+            session_date TEXT NOT NULL,
+            symbol TEXT NOT NULL,
+            metrics TEXT,
+            fingerprint TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (market, session_date, symbol)
+        );
+        CREATE INDEX IF NOT EXISTS symbol_metrics_symbol
+            ON symbol_metrics (market, symbol, session_date);
+        CREATE TABLE IF NOT EXISTS leases (
+            name TEXT PRIMARY KEY,
+            until REAL NOT NULL
+        );
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _write(self, fn, *args):
+        """Run fn(conn, *args) inside one write transaction and return its result."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn, *args)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    async def ensure_schema(self):
+        await asyncio.to_thread(lambda: self._conn().executescript(self._SCHEMA))
+
+    async def save_snapshots(self, snapshots):
+        if snapshots:
+            await asyncio.to_thread(self._write, self._save_snapshots, snapshots)
+
+    @staticmethod
+    def _save_snapshots(conn: sqlite3.Connection, snapshots: list[dict]):
+        now = datetime.now(timezone.utc).isoformat()
+        conn.executemany(
+            """INSERT INTO group_snapshots VALUES (?, ?, ?, ?, ?, ?, ?)
+               ON CONFLICT (group_id, market, session_date) DO UPDATE SET
+                   symbols = excluded.symbols, rankings = excluded.rankings,
+                   updated_at = excluded.updated_at""",
+            [(s["group_id"], s["market"], s["session_date"], json.dumps(s["symbols"]),
+              json.dumps(s["rankings"]), now, now) for s in snapshots],
+        )
+        conn.executemany(
+            "DELETE FROM snapshot_ranks WHERE group_id = ? AND market = ? AND session_date = ?",
+            [(s["group_id"], s["market"], s["session_date"]) for s in snapshots],
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO snapshot_ranks VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [(s["group_id"], s["market"], s["session_date"], r["symbol"], r.get("rank"),
+              r.get("combined_score"), r.get("earnings_yield"), r.get("roic"))
+             for s in snapshots for r in s["rankings"]],
+        )
+
+    async def get_snapshot(self, group_id, market, session_date):
+        def query():
+            return self._conn().execute(
+                """SELECT group_id, market, session_date, symbols, rankings FROM group_snapshots
+                   WHERE group_id = ? AND market = ? AND session_date = ?""",
+                (group_id, market, session_date),
+            ).fetchone()
+
+        row = await asyncio.to_thread(query)
+        if row is None:
+            return None
+        return {**dict(row), "symbols": json.loads(row["symbols"]), "rankings": json.loads(row["rankings"])}
+
+    async def list_snapshot_dates(self, group_id, market):
+        def query():
+            return self._conn().execute(
+                """SELECT session_date FROM group_snapshots WHERE group_id = ? AND market = ?
+                   ORDER BY session_date DESC""",
+                (group_id, market),
+            ).fetchall()
+
+        return [row["session_date"] for row in await asyncio.to_thread(query)]
+
+    async def get_rank_changes(self, group_id, market, from_date, to_date):
+        def query():
+            return self._conn().execute(
+                """SELECT symbol, from_rank, to_rank,
+                          CASE WHEN from_rank IS NOT NULL AND to_rank IS NOT NULL
+                               THEN from_rank - to_rank END AS change
+                   FROM (SELECT symbol,
+                                MAX(CASE WHEN session_date = :from_date THEN rank END) AS from_rank,
+                                MAX(CASE WHEN session_date = :to_date THEN rank END) AS to_rank
+                         FROM snapshot_ranks
+                         WHERE group_id = :group_id AND market = :market
+                           AND session_date IN (:from_date, :to_date)
+                         GROUP BY symbol)
+                   ORDER BY to_rank IS NULL, to_rank, from_rank""",
+                {"group_id": group_id, "market": market, "from_date": from_date, "to_date": to_date},
+            ).fetchall()
+
+        return [dict(row) for row in await asyncio.to_thread(query)]
+
+    async def get_rank_trajectory(self, group_id, market, symbol):
+        def query():
+            return self._conn().execute(
+                """SELECT session_date, rank, combined_score, earnings_yield, roic
+                   FROM snapshot_ranks WHERE group_id = ? AND market = ? AND symbol = ?
+                   ORDER BY session_date""",
+                (group_id, market, symbol),
+            ).fetchall()
+
+        return [dict(row) for row in await asyncio.to_thread(query)]
+
+    async def get_symbol_metric_history(self, market, symbols, until, limit):
+        def query():
+            placeholders = ",".join("?" * len(symbols))
+            return self._conn().execute(
+                f"""SELECT symbol, session_date, metrics, fingerprint FROM (
+                        SELECT *, ROW_NUMBER() OVER (PARTITION BY symbol ORDER BY session_date DESC) AS n
+                        FROM symbol_metrics
+                        WHERE market = ? AND session_date <= ? AND symbol IN ({placeholders}))
+                    WHERE n <= ? ORDER BY symbol, session_date DESC""",
+                (market, until, *symbols, limit),
+            ).fetchall()
+
+        history: dict[str, list[dict]] = {}
+        for row in await asyncio.to_thread(query):
+            history.setdefault(row["symbol"], []).append({
+                "session_date": row["session_date"],
+                "metrics": json.loads(row["metrics"]) if row["metrics"] else None,
+                "fingerprint": json.loads(row["fingerprint"]) if row["fingerprint"] else None,
+            })
+        return history
+
+    async def save_symbol_metrics(self, market, session_date, entries):
+        def write(conn: sqlite3.Connection):
+            now = datetime.now(timezone.utc).isoformat()
+            conn.executemany(
+                "INSERT OR REPLACE INTO symbol_metrics VALUES (?, ?, ?, ?, ?, ?)",
+                [(market, session_date, symbol,
+                  json.dumps(entry.get("metrics")) if entry.get("metrics") is not None else None,
+                  json.dumps(entry.get("fingerprint")) if entry.get("fingerprint") is not None else None,
+                  now)
+                 for symbol, entry in entries.items()],
+            )
+
+        await asyncio.to_thread(self._write, write)
+
+    async def claim_lease(self, name, ttl):
+        def claim(conn: sqlite3.Connection) -> bool:
+            now = datetime.now(timezone.utc).timestamp()
+            conn.execute("DELETE FROM leases WHERE name = ? AND until <= ?", (name, now))
+            return conn.execute("INSERT OR IGNORE INTO leases VALUES (?, ?)",
+                                (name, now + ttl)).rowcount == 1
+
+        return await asyncio.to_thread(self._write, claim)
+
+    async def release_lease(self, name):
+        await asyncio.to_thread(self._write, lambda conn: conn.execute("DELETE FROM leases WHERE name = ?",
+                                                                       (name,)))
@@ -0,0 +1,81 @@
+"""On-disk normalized financial statements, one file per symbol+market.
+
+Annual statements change a few times a year, yet every session boundary
+expires the cached FinancialsBundle. Each stored record keeps the
+statements together with Yahoo's fiscal-period markers from the info dict
+(last fiscal year end, most recent quarter). While those markers are
+unchanged, the stored statements are reused instead of downloading four
+statements again.
+
+A record is refetched regardless once it is older than
+STATEMENT_MAX_AGE_DAYS (default 7), which catches restatements that keep
+the same period dates. Files live under STATEMENT_STORE_DIR (default:
+<project>/data/statements) as <MARKET>/<SYMBOL>.pkl and are replaced
+atomically on every write.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import pickle
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from core.statements import Statement
+
+logger = logging.getLogger(__name__)
+
+STORE_DIR = Path(os.getenv(
+    "STATEMENT_STORE_DIR",
+    Path(__file__).resolve().parent.parent / "data" / "statements",
+))
+
+MAX_AGE = timedelta(days=float(os.getenv("STATEMENT_MAX_AGE_DAYS", 7)))
+
+
+def fiscal_marker(info: dict) -> tuple | None:
+    """Yahoo's latest fiscal period dates for a stock, or None if info has neither."""
+    marker = (info.get("lastFiscalYearEnd"), info.get("mostRecentQuarter"))
+    return marker if any(v is not None for v in marker) else None
+
+
+def _path(symbol: str, market: str) -> Path:
+    safe_symbol = symbol.upper().replace(os.sep, "_")
+    return STORE_DIR / market.upper() / f"{safe_symbol}.pkl"
+
+
+def load(symbol: str, market: str, marker: tuple | None) -> dict[str, Statement] | None:
+    """Return stored statements if they are recent and fetched under the same fiscal marker."""
+    if marker is None:
+        return None
+    path = _path(symbol, market)
+    if not path.exists():
+        return None
+    try:
+        with open(path, "rb") as f:
+            record = pickle.load(f)
+    except Exception:
+        logger.warning("Unreadable statement file %s — ignoring", path, exc_info=True)
+        return None
+
+    if record.get("marker") != marker:
+        logger.debug("STATEMENTS STALE %s/%s (fiscal marker changed)", market.upper(), symbol.upper())
+        return None
+    if datetime.now(timezone.utc) - record["saved_at"] > MAX_AGE:
+        return None
+    return record["statements"]
+
+
+def save(symbol: str, market: str, marker: tuple | None, statements: dict[str, Statement]):
+    """Atomically replace the stored statements for a symbol."""
+    path = _path(symbol, market)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    record = {"marker": marker, "saved_at": datetime.now(timezone.utc), "statements": statements}
+    # Unique per write: statement downloads for the same symbol may run on several threads
+    with tempfile.NamedTemporaryFile(dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp",
+                                     delete=False) as f:
+        pickle.dump(record, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(f.name, path)
+    logger.debug("STATEMENTS SAVE %s/%s", market.upper(), symbol.upper())
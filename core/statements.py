@@ -0,0 +1,99 @@
+"""Financial statements normalized onto one canonical line-item schema.
+
+Yahoo labels the same line item differently across companies and over time
+("Net Income" vs "Net Income Common Stockholders", "Current Assets" vs
+"Total Current Assets", ...). normalize() resolves those variants once, when
+a statement is fetched, into a (line items x periods) float array, so the
+scorers look values up by canonical name in O(1) and can work on whole
+multi-period rows at once.
+"""
+
+from __future__ import annotations
+
+import hashlib
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+# Canonical line item -> Yahoo row labels, in order of preference
+LINE_ITEMS: dict[str, tuple[str, ...]] = {
+    # Income statement
+    "Total Revenue": ("Total Revenue", "Operating Revenue"),
+    "Cost Of Revenue": ("Cost Of Revenue", "Cost Of Goods Sold"),
+    "Gross Profit": ("Gross Profit",),
+    "Operating Expense": ("Operating Expense", "Total Operating Expenses",
+                          "Selling General And Administration"),
+    "EBIT": ("EBIT", "Operating Income"),
+    "Net Income": ("Net Income", "Net Income Common Stockholders",
+                   "Net Income From Continuing Operations"),
+    # Balance sheet
+    "Total Assets": ("Total Assets",),
+    "Current Assets": ("Current Assets", "Total Current Assets"),
+    "Current Liabilities": ("Current Liabilities", "Total Current Liabilities"),
+    "Long Term Debt": ("Long Term Debt", "Long Term Debt And Capital Lease Obligation"),
+    "Ordinary Shares Number": ("Ordinary Shares Number", "Share Issued"),
+    # Cash flow statement
+    "Operating Cash Flow": ("Operating Cash Flow", "Total Cash From Operating Activities",
+                            "Cash Flow From Continuing Operating Activities"),
+}
+
+_ROW = {item: i for i, item in enumerate(LINE_ITEMS)}
+
+
+@dataclass(frozen=True)
+class Statement:
+    """One statement as a (len(LINE_ITEMS), periods) float array; NaN where missing.
+
+    Periods are ordered most recent first, matching Yahoo's column order.
+    """
+
+    periods: tuple[pd.Timestamp, ...]
+    values: np.ndarray
+
+    @property
+    def n_periods(self) -> int:
+        return len(self.periods)
+
+    @property
+    def empty(self) -> bool:
+        return not self.periods
+
+    def get(self, item: str, period: int = 0) -> float | None:
+        """Value of a canonical line item for the period at that position, or None."""
+        if period >= len(self.periods):
+            return None
+        v = self.values[_ROW[item], period]
+        return float(v) if np.isfinite(v) else None
+
+    def row(self, item: str) -> np.ndarray:
+        """All periods of a canonical line item (a read-only view, NaN where missing)."""
+        return self.values[_ROW[item]]
+
+    def digest(self) -> str:
+        """Content hash of the periods and values, for detecting restated or new periods."""
+        h = hashlib.sha1()
+        h.update(repr([str(p) for p in self.periods]).encode())
+        h.update(np.ascontiguousarray(self.values).tobytes())
+        return h.hexdigest()
+
+
+def normalize(df: pd.DataFrame | None) -> Statement:
+    """Map a Yahoo statement DataFrame (labels x period dates) onto LINE_ITEMS.
+
+    For every period the first label variant with a finite value wins, so a
+    variant that is present but empty for some years falls through to the next.
+    """
+    if df is None or df.empty:
+        return Statement(periods=(), values=np.empty((len(LINE_ITEMS), 0)))
+
+    raw = df.apply(pd.to_numeric, errors="coerce")
+    raw = raw[~raw.index.duplicated()]
+    values = np.full((len(LINE_ITEMS), raw.shape[1]), np.nan)
+    for i, labels in enumerate(LINE_ITEMS.values()):
+        for label in reversed(labels):
+            if label in raw.index:
+                row = raw.loc[label].to_numpy(dtype=float)
+                values[i] = np.where(np.isfinite(row), row, values[i])
+    values.flags.writeable = False
+    return Statement(periods=tuple(raw.columns), values=values)
@@ -0,0 +1,97 @@
+"""Bridge from blocking generators to asyncio.
+
+iterate_concurrently() runs several synchronous generators on worker
+threads at once and hands their items to the event loop as soon as each one
+is produced. Items travel through an asyncio.Queue fed with
+loop.call_soon_threadsafe, the thread-safe way into the loop.
+
+The generators run on a dedicated pool of STREAMING_MAX_THREADS threads
+(default 32), not asyncio's default executor. A generator holds its thread
+for as long as it runs, and short asyncio.to_thread calls elsewhere in the
+app must not queue behind it. Once the pool is busy, further generators
+wait for a free thread.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Iterator
+
+MAX_THREADS = int(os.getenv("STREAMING_MAX_THREADS", 32))
+
+_DONE = object()
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=MAX_THREADS, thread_name_prefix="streaming")
+        return _executor
+
+
+async def iterate_concurrently(generators: dict[str, Callable[[], Iterator]]
+                               ) -> AsyncIterator[tuple[str, int, Any]]:
+    """Yield (key, index, item) from all generators, interleaved in production order.
+
+    Args:
+        generators: Key -> zero-argument callable returning the generator,
+            e.g. functools.partial(technical_analysis, symbol, market=market).
+            index is the item's position within its own generator.
+
+    Raises:
+        The first exception raised by any generator, after the items it
+        produced before failing. The other generators are then asked to stop
+        (they finish their current item first), as they are when the
+        consumer stops iterating early.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+
+    def put(message):
+        try:
+            loop.call_soon_threadsafe(queue.put_nowait, message)
+        except RuntimeError:
+            # Event loop already closed: nobody is listening any more
+            stop.set()
+
+    def produce(key: str, factory: Callable[[], Iterator]):
+        try:
+            generator = factory()
+            try:
+                for index, item in enumerate(generator):
+                    if stop.is_set():
+                        break
+                    put((key, index, item, None))
+            finally:
+                close = getattr(generator, "close", None)
+                if close:
+                    close()
+        except BaseException as e:
+            put((key, None, None, e))
+        finally:
+            put((key, None, _DONE, None))
+
+    executor = _get_executor()
+    for key, factory in generators.items():
+        loop.run_in_executor(executor, produce, key, factory)
+
+    remaining = len(generators)
+    try:
+        while remaining:
+            key, index, item, error = await queue.get()
+            if error is not None:
+                raise error
+            if item is _DONE:
+                remaining -= 1
+                continue
+            yield key, index, item
+    finally:
+        stop.set()
@@ -0,0 +1,187 @@
+"""Bundled full-universe ticker directory.
+
+Each market's listing is a gzip-compressed, tab-separated file in
+core/ticker_data/ (<MARKET>.tsv.gz, one "SYMBOL<TAB>Company name" line per
+listing, most popular first). Files are only read when a market is first
+searched.
+
+Regenerate them from the published symbol lists with:
+
+    python -m core.ticker_directory            # all markets
+    python -m core.ticker_directory --market IN
+    python -m core.ticker_directory --market US --listing company_tickers_exchange.json
+
+--listing builds from a local copy of the source file instead of
+downloading it. NSE's archive host often refuses requests from servers;
+when it does, save EQUITY_L.csv from a browser and pass it with
+--market IN --listing EQUITY_L.csv.
+
+Sources:
+    IN  NSE equity list (EQUITY_L.csv), series EQ and BE. BSE-only scrips
+        are left out: prices are fetched with Yahoo's NSE suffix.
+    US  SEC company tickers by exchange (company_tickers_exchange.json),
+        Nasdaq, NYSE and Cboe listings in the SEC's order (largest
+        companies first). Preferred shares, units, rights and warrants
+        are left out. The SEC asks for a User-Agent naming the requester; set
+        SEC_USER_AGENT.
+The curated NSE_TICKERS / US_TICKERS lists in core.tickers go first, so
+well-known names keep their popularity order and display names.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent / "ticker_data"
+
+NSE_EQUITY_URL = "https://nsearchives.nseindia.com/content/equities/EQUITY_L.csv"
+SEC_TICKERS_URL = "https://www.sec.gov/files/company_tickers_exchange.json"
+SEC_USER_AGENT = os.getenv("SEC_USER_AGENT", "stock-analyze ticker directory")
+
+_US_EXCHANGES = ("Nasdaq", "NYSE", "CBOE")
+# Share classes are spelled like Yahoo's ("BRK-B"); longer suffixes mark
+# preferreds ("BAC-PB"), units and warrants, which Yahoo spells differently
+_US_SYMBOL_RE = re.compile(r"^[A-Z]+(-[A-Z])?$")
+# Nasdaq marks other issues with a fifth letter: U units, R rights, W warrants
+# ("BRKHU") and P, O, N, M preferreds ("BRKRP"). SEC names rarely say so, but
+# a name ending in "Units", "Rights" or "Warrants" is dropped too
+_US_NOT_COMMON_RE = re.compile(r"^[A-Z]{4}[URWPONM]$")
+_US_NOT_COMMON_NAME_RE = re.compile(r"\b(units?|rights?|warrants?)$", re.IGNORECASE)
+# SEC conformed names end in a state of incorporation, e.g. "BANK OF AMERICA CORP /DE/"
+_SEC_STATE_RE = re.compile(r"\s*/[A-Z]{2,3}/?$")
+
+
+def path(market: str) -> Path:
+    return DATA_DIR / f"{market.upper()}.tsv.gz"
+
+
+def load(market: str) -> list[tuple[str, str]]:
+    """Return a market's bundled (symbol, name) listing, or [] if it has no data file."""
+    data_path = path(market)
+    if not data_path.exists():
+        return []
+    with gzip.open(data_path, "rt", encoding="utf-8") as f:
+        rows = [tuple(line.rstrip("\n").split("\t", 1)) for line in f if "\t" in line]
+    logger.info("Loaded %d %s tickers from %s", len(rows), market.upper(), data_path.name)
+    return rows
+
+
+def save(market: str, tickers: list[tuple[str, str]]):
+    """Write a listing, deduplicated by symbol (first wins), replacing the file atomically."""
+    data_path = path(market)
+    data_path.parent.mkdir(parents=True, exist_ok=True)
+    seen = set()
+    lines = []
+    for symbol, name in tickers:
+        symbol = symbol.strip().upper()
+        name = " ".join(name.split())
+        if symbol and symbol not in seen:
+            seen.add(symbol)
+            lines.append(f"{symbol}\t{name}\n")
+
+    tmp_path = data_path.with_suffix(f".{os.getpid()}.tmp")
+    # mtime=0 keeps rebuilt files byte-identical when the listing is unchanged
+    with open(tmp_path, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        f.write("".join(lines).encode("utf-8"))
+    os.replace(tmp_path, data_path)
+    logger.info("Wrote %d %s tickers to %s", len(lines), market.upper(), data_path)
+
+
+def _download_text(url: str, user_agent: str = "Mozilla/5.0") -> str:
+    import requests
+
+    r = requests.get(url, headers={"User-Agent": user_agent}, timeout=30)
+    r.raise_for_status()
+    return r.text
+
+
+def _parse_nse_listing(text: str) -> list[tuple[str, str]]:
+    reader = csv.DictReader(io.StringIO(text.lstrip("\ufeff")))
+    rows = []
+    for row in reader:
+        row = {k.strip(): (v or "").strip() for k, v in row.items()}
+        if row.get("SERIES") in ("EQ", "BE"):
+            rows.append((row["SYMBOL"], row["NAME OF COMPANY"]))
+    return sorted(rows)
+
+
+def _parse_sec_listing(text: str) -> list[tuple[str, str]]:
+    data = json.loads(text)
+    fields = data["fields"]
+    rows = []
+    for values in data["data"]:
+        row = dict(zip(fields, values))
+        symbol = (row.get("ticker") or "").upper()
+        name = _SEC_STATE_RE.sub("", row.get("name") or "")
+        if row.get("exchange") not in _US_EXCHANGES or not _US_SYMBOL_RE.match(symbol):
+            continue
+        if _US_NOT_COMMON_RE.match(symbol) or _US_NOT_COMMON_NAME_RE.search(name):
+            continue
+        rows.append((symbol, name))
+    # Kept in the SEC's order, which puts the largest companies first
+    return rows
+
+
+# Market -> (source URL, User-Agent, parser of the source file's text)
+_SOURCES = {
+    "IN": (NSE_EQUITY_URL, "Mozilla/5.0", _parse_nse_listing),
+    "US": (SEC_TICKERS_URL, SEC_USER_AGENT, _parse_sec_listing),
+}
+
+
+def build(market: str, curated: list[tuple[str, str]], offline: bool = False,
+          listing_path: str | None = None):
+    """Regenerate a market's data file: curated list first, then the exchange listing.
+
+    Raises:
+        ValueError: If the listing parses to no tickers.
+
+    Args:
+        offline: Write only the curated list.
+        listing_path: Local copy of the market's source file to parse
+            instead of downloading it.
+    """
+    url, user_agent, parse = _SOURCES[market.upper()]
+    if offline:
+        listing = []
+    elif listing_path:
+        listing = parse(Path(listing_path).read_text(encoding="utf-8"))
+    else:
+        listing = parse(_download_text(url, user_agent))
+    if not offline and not listing:
+        # NSE answers blocked clients with an HTML page; don't ship a curated-only file
+        raise ValueError(f"{market.upper()} listing has no tickers")
+    logger.info("%s listing: %d tickers", market.upper(), len(listing))
+    save(market, list(curated) + listing)
+
+
+def main():
+    from core.tickers import _TICKER_LISTS
+
+    parser = argparse.ArgumentParser(description="Rebuild the bundled ticker directory files.")
+    parser.add_argument("--market", action="append", choices=sorted(_SOURCES),
+                        help="market to rebuild (repeatable; default all)")
+    parser.add_argument("--offline", action="store_true",
+                        help="write only the curated lists, without downloading listings")
+    parser.add_argument("--listing", help="local copy of the source file (requires a single --market)")
+    args = parser.parse_args()
+    if args.listing and len(args.market or []) != 1:
+        parser.error("--listing requires exactly one --market")
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO)
+    for market in args.market or sorted(_SOURCES):
+        build(market, _TICKER_LISTS[market], offline=args.offline, listing_path=args.listing)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,253 @@
+"""In-memory search index over a ticker directory.
+
+Built once per market from (symbol, name) pairs, whose order is the
+popularity order used to break ties:
+  - a prefix trie on symbols, where every node keeps the first
+    MAX_PREFIX_IDS ids below it in popularity order, so a symbol prefix
+    lookup costs O(len(query) + limit);
+  - an inverted index from lower-cased name tokens to ids, with a sorted
+    vocabulary so a query token matches every name token it prefixes;
+  - for typo tolerance, a trigram index over name words and symbols, built
+    on the first query that matches nothing exactly.
+
+Results are ranked by match tier (exact symbol, symbol prefix, query
+matching the start of the name, query matching later name words, fuzzy
+match by trigram similarity), then by popularity.
+"""
+
+from __future__ import annotations
+
+import heapq
+import re
+import threading
+from bisect import bisect_left
+from collections import Counter
+from itertools import islice
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+EXACT_SYMBOL, SYMBOL_PREFIX, NAME_START, NAME_WORD, FUZZY = range(5)
+
+# Ids kept per trie node; more than any autocomplete page needs
+MAX_PREFIX_IDS = 32
+# Minimum Dice similarity of trigram sets for a fuzzy match
+FUZZY_MIN_SIMILARITY = 0.45
+# Shortest query (alphanumerics) that is matched fuzzily
+FUZZY_MIN_LENGTH = 3
+# Closest words considered per fuzzy query
+FUZZY_MAX_WORDS = 20
+
+
+def tokenize(text: str) -> list[str]:
+    """Lower-cased alphanumeric words ("Dr. Reddy's Labs" -> ["dr", "reddy", "s", "labs"])."""
+    return _TOKEN_RE.findall(text.lower())
+
+
+def _covers(words: tuple[str, ...], tokens: list[str]) -> bool:
+    """True if each token prefixes a different word (longest tokens placed first)."""
+    unused = list(words)
+    for token in sorted(tokens, key=len, reverse=True):
+        for k, word in enumerate(unused):
+            if word.startswith(token):
+                del unused[k]
+                break
+        else:
+            return False
+    return True
+
+
+def _trigrams(word: str) -> set[str]:
+    padded = f"  {word} "
+    return {padded[k:k + 3] for k in range(len(padded) - 2)}
+
+
+class _TrieNode:
+    __slots__ = ("children", "ids")
+
+    def __init__(self):
+        self.children: dict[str, _TrieNode] = {}
+        self.ids: list[int] = []
+
+
+class TickerIndex:
+    """Symbol trie plus name-token inverted index over one market's tickers."""
+
+    def __init__(self, tickers: list[tuple[str, str]]):
+        self._symbols: list[str] = []
+        self._names: list[str] = []
+        self._name_tokens: list[tuple[str, ...]] = []
+        self._by_symbol: dict[str, int] = {}
+        self._trie = _TrieNode()
+        postings: dict[str, list[int]] = {}
+
+        for symbol, name in tickers:
+            symbol = symbol.upper()
+            if symbol in self._by_symbol:
+                continue
+            i = len(self._symbols)
+            self._symbols.append(symbol)
+            self._names.append(name)
+            self._by_symbol[symbol] = i
+
+            node = self._trie
+            for ch in symbol:
+                node = node.children.setdefault(ch, _TrieNode())
+                if len(node.ids) < MAX_PREFIX_IDS:
+                    node.ids.append(i)
+
+            tokens = tuple(tokenize(name))
+            self._name_tokens.append(tokens)
+            for token in dict.fromkeys(tokens):
+                postings.setdefault(token, []).append(i)
+
+        self._vocabulary = sorted(postings)
+        self._postings = [postings[t] for t in self._vocabulary]
+        self._fuzzy: tuple[list[str], list[list[int]], dict[str, list[int]]] | None = None
+        self._fuzzy_lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._symbols)
+
+    def entry(self, i: int) -> dict:
+        return {"symbol": self._symbols[i], "name": self._names[i]}
+
+    def search(self, query: str, limit: int = 8) -> list[dict]:
+        """Best `limit` matches for a symbol or company-name query."""
+        return [self.entry(i) for _, _, i in self.ranked(query, limit)]
+
+    def ranked(self, query: str, limit: int) -> list[tuple[int, float, int]]:
+        """(tier, -similarity, id) of the best `limit` matches, best first.
+
+        Similarity is 0 for all but fuzzy matches.
+        """
+        query = query.strip()
+        if not query or limit <= 0:
+            return []
+
+        found: dict[int, tuple[int, float]] = {}
+        symbol_query = query.upper().replace(" ", "")
+        exact = self._by_symbol.get(symbol_query)
+        if exact is not None:
+            found[exact] = (EXACT_SYMBOL, 0.0)
+        node = self._trie
+        for ch in symbol_query:
+            node = node.children.get(ch)
+            if node is None:
+                break
+        else:
+            for i in islice(node.ids, limit + 1):
+                found.setdefault(i, (SYMBOL_PREFIX, 0.0))
+
+        # Symbol matches outrank every name match, so a full page of them is final
+        tokens = tokenize(query)
+        if len(found) < limit:
+            self._match_names(tokens, limit, found)
+        # Typos: only when nothing matched exactly, so fuzzy noise never pads real results
+        if not found:
+            self._match_fuzzy(symbol_query.lower(), tokens, found)
+
+        return heapq.nsmallest(limit, ((tier, score, i) for i, (tier, score) in found.items()))
+
+    def _token_range(self, token: str) -> range:
+        """Vocabulary positions of every name token starting with `token`."""
+        lo = bisect_left(self._vocabulary, token)
+        hi = bisect_left(self._vocabulary, token + "\uffff", lo)
+        return range(lo, hi)
+
+    def _match_names(self, tokens: list[str], limit: int, found: dict[int, tuple[int, float]]):
+        """Add ids whose name has, for every query token, a distinct word starting with it."""
+        if not tokens:
+            return
+        ranges = [self._token_range(t) for t in tokens]
+        if any(not r for r in ranges):
+            return
+
+        # Drive the scan with the query token that has the fewest postings
+        lead = min(range(len(tokens)), key=lambda k: sum(len(self._postings[p]) for p in ranges[k]))
+        candidates = heapq.merge(*(self._postings[p] for p in ranges[lead]))
+
+        start_matches = 0
+        last = -1
+        for i in candidates:
+            if i == last:
+                continue
+            last = i
+            words = self._name_tokens[i]
+            if len(tokens) > 1 and not _covers(words, tokens):
+                continue
+            tier = NAME_START if words[0].startswith(tokens[0]) else NAME_WORD
+            found.setdefault(i, (tier, 0.0))
+            if tier == NAME_START:
+                start_matches += 1
+            # Ids arrive in popularity order: once `limit` name-start matches
+            # are in, later ids can't make the cut
+            if start_matches >= limit:
+                break
+
+    def _fuzzy_index(self) -> tuple[list[str], list[list[int]], dict[str, list[int]]]:
+        """(words, ids per word, trigram -> word positions) over name words and symbols."""
+        with self._fuzzy_lock:
+            if self._fuzzy is None:
+                words = list(self._vocabulary)
+                ids = list(self._postings)
+                for i, symbol in enumerate(self._symbols):
+                    words.append(symbol.lower())
+                    ids.append([i])
+                grams: dict[str, list[int]] = {}
+                for w, word in enumerate(words):
+                    for gram in _trigrams(word):
+                        grams.setdefault(gram, []).append(w)
+                self._fuzzy = words, ids, grams
+            return self._fuzzy
+
+    def _similar_words(self, word: str) -> list[tuple[float, int]]:
+        """(similarity, word position) of the closest fuzzy-index words to `word`."""
+        words, _, grams = self._fuzzy_index()
+        query_grams = _trigrams(word)
+        shared = Counter(w for gram in query_grams for w in grams.get(gram, ()))
+        scored = []
+        for w, count in shared.items():
+            # Dice coefficient; a word of n letters has n + 1 padded trigrams
+            similarity = 2 * count / (len(query_grams) + len(words[w]) + 1)
+            if similarity >= FUZZY_MIN_SIMILARITY:
+                scored.append((similarity, w))
+        return heapq.nlargest(FUZZY_MAX_WORDS, scored)
+
+    def _match_fuzzy(self, compact: str, tokens: list[str], found: dict[int, tuple[int, float]]):
+        """Add ids whose symbol is similar to the query, or whose name covers every query word.
+
+        A query word is covered by a name word it prefixes or one similar to
+        it; an id's score is the mean similarity over the query words.
+        """
+        _, ids, _ = self._fuzzy_index()
+        n_names = len(self._vocabulary)
+        scores: dict[int, float] = {}
+
+        compact = "".join(tokenize(compact))
+        if len(compact) >= FUZZY_MIN_LENGTH:
+            for similarity, w in self._similar_words(compact):
+                if w >= n_names:
+                    scores[ids[w][0]] = similarity
+
+        per_token = []
+        for token in tokens:
+            matches: dict[int, float] = {}
+            if len(token) >= FUZZY_MIN_LENGTH:
+                for similarity, w in self._similar_words(token):
+                    if w < n_names:
+                        for i in ids[w]:
+                            matches[i] = max(matches.get(i, 0.0), similarity)
+            for p in self._token_range(token):
+                for i in self._postings[p]:
+                    matches[i] = 1.0
+            per_token.append(matches)
+        if per_token:
+            common = set.intersection(*(set(m) for m in per_token))
+            # Every word matching exactly was already a name match
+            for i in common:
+                score = sum(m[i] for m in per_token) / len(per_token)
+                if score < 1.0:
+                    scores[i] = max(scores.get(i, 0.0), score)
+
+        for i, score in scores.items():
+            found[i] = (FUZZY, -score)
@@ -1,5 +1,11 @@
 """Stock ticker directory for autocomplete suggestions."""
 
+import asyncio
+import threading
+
+from core import ticker_directory, yahoo_search
+from core.ticker_index import TickerIndex
+
 # Top ~200 NSE stocks by market cap / popularity
 # Format: (SYMBOL, COMPANY_NAME)
 NSE_TICKERS = [
@@ -315,67 +321,36 @@ _TICKER_LISTS = {
 }
 
 
-def _search_local(query: str, limit: int, market: str = "IN") -> list[dict]:
-    """Search the local ticker list."""
-    tickers = _TICKER_LISTS.get(market.upper(), NSE_TICKERS)
-    query_upper = query.upper().strip()
-    results = []
+_indexes: dict[str, TickerIndex] = {}
+_indexes_lock = threading.Lock()
 
-    # Exact symbol prefix matches first
-    for symbol, name in tickers:
-        if symbol.startswith(query_upper):
-            results.append({"symbol": symbol, "name": name})
 
-    # Then name matches
-    query_lower = query.lower()
-    for symbol, name in tickers:
-        if query_lower in name.lower() and {"symbol": symbol, "name": name} not in results:
-            results.append({"symbol": symbol, "name": name})
+def _index_market(market: str) -> str:
+    return market.upper() if market.upper() in _TICKER_LISTS else "IN"
 
-    return results[:limit]
 
+def _get_index(market: str) -> TickerIndex:
+    """Lazily built index over the curated list plus the market's bundled full listing."""
+    market = _index_market(market)
+    with _indexes_lock:
+        if market not in _indexes:
+            _indexes[market] = TickerIndex(_TICKER_LISTS[market] + ticker_directory.load(market))
+        return _indexes[market]
 
-def _search_yahoo(query: str, limit: int, market: str = "IN") -> list[dict]:
-    """Fallback: search Yahoo Finance for tickers."""
-    import requests
 
-    try:
-        url = "https://query2.finance.yahoo.com/v1/finance/search"
-        params = {"q": query, "quotesCount": limit, "newsCount": 0}
-        headers = {"User-Agent": "Mozilla/5.0"}
-        r = requests.get(url, params=params, headers=headers, timeout=5)
-        r.raise_for_status()
+def load_search_indexes():
+    """Build every market's index up front (blocking; the web app runs it at startup)."""
+    for market in _TICKER_LISTS:
+        _get_index(market)
 
-        results = []
-        for q in r.json().get("quotes", []):
-            sym = q.get("symbol", "")
-            name = q.get("longname") or q.get("shortname") or sym
 
-            if market.upper() == "IN":
-                # Only include NSE (.NS) and BSE (.BO) stocks
-                if sym.endswith(".NS") or sym.endswith(".BO"):
-                    clean_symbol = sym.rsplit(".", 1)[0]
-                    exchange = "NSE" if sym.endswith(".NS") else "BSE"
-                    results.append({
-                        "symbol": clean_symbol,
-                        "name": f"{name} ({exchange})",
-                    })
-            else:
-                # For US market, include symbols without exchange suffix
-                # or common US exchanges
-                if not sym.endswith((".NS", ".BO", ".L", ".HK", ".SS", ".SZ")):
-                    clean_symbol = sym.split(".")[0] if "." in sym else sym
-                    results.append({
-                        "symbol": clean_symbol,
-                        "name": name,
-                    })
-        return results[:limit]
-    except Exception:
-        return []
+def _search_local(query: str, limit: int, market: str = "IN") -> list[dict]:
+    """Search the local ticker index (symbols, company-name words, then close spellings)."""
+    return _get_index(market).search(query, limit)
 
 
-def search_tickers(query: str, limit: int = 8, market: str = "IN") -> list[dict]:
-    """Search tickers — local list first, Yahoo Finance fallback.
+async def search_tickers(query: str, limit: int = 8, market: str = "IN") -> list[dict]:
+    """Search tickers — local directory first, Yahoo Finance fallback.
 
     Returns list of {"symbol": ..., "name": ...} dicts.
     """
@@ -383,14 +358,17 @@ def search_tickers(query: str, limit: int = 8, market: str = "IN") -> list[dict]
     if not query:
         return []
 
-    # Try local list first
-    local_results = _search_local(query, limit, market)
+    if _index_market(market) in _indexes:
+        local_results = _search_local(query, limit, market)
+    else:
+        # Building the index reads the data file; keep that off the event loop
+        local_results = await asyncio.to_thread(_search_local, query, limit, market)
 
     if len(local_results) >= 3:
         return local_results
 
-    # Supplement with Yahoo Finance search
-    yahoo_results = _search_yahoo(query, limit, market)
+    # Supplement with Yahoo Finance search, e.g. for a listing missing from the data files
+    yahoo_results = await yahoo_search.search(query, limit, market)
     seen = {r["symbol"] for r in local_results}
     for yr in yahoo_results:
         if yr["symbol"] not in seen:
@@ -0,0 +1,167 @@
+"""Adaptive bounded-concurrency scheduler for blocking per-symbol work.
+
+run_adaptive() feeds items to a blocking function on a dedicated thread
+pool (not asyncio's default executor, which every request shares). It
+starts the next item as soon as any slot frees up, and yields results in
+completion order.
+
+Each call gets a timeout, and failed or timed-out items are requeued up to
+`retries` times. The concurrency limit adapts AIMD-style, as in TCP
+congestion control: it creeps up by about one slot per window of healthy
+completions, halves on an error or timeout, and backs off when latency
+climbs well above the best latency seen so far.
+
+A timed-out call can't be interrupted inside its thread; it is abandoned
+and its result ignored. The pool has headroom for such stragglers.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Callable
+
+logger = logging.getLogger(__name__)
+
+MAX_CONCURRENCY = int(os.getenv("WORK_QUEUE_MAX_CONCURRENCY", 16))
+TIMEOUT = float(os.getenv("WORK_QUEUE_TIMEOUT", 30))
+RETRIES = int(os.getenv("WORK_QUEUE_RETRIES", 2))
+
+# Back off when the latency average exceeds this multiple of the best one seen
+LATENCY_BACKOFF_RATIO = 2.5
+# Weight of the newest sample in the latency moving average
+LATENCY_SMOOTHING = 0.2
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Lazy dedicated pool, twice MAX_CONCURRENCY so abandoned timed-out calls don't starve it."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=2 * MAX_CONCURRENCY,
+                                           thread_name_prefix="work-queue")
+        return _executor
+
+
+@dataclass
+class WorkResult:
+    """Outcome of one item; error is set (and value None) if every attempt failed."""
+
+    index: int
+    item: Any
+    value: Any = None
+    error: BaseException | None = None
+    attempts: int = 0
+    elapsed: float = 0.0
+
+
+class ConcurrencyLimit:
+    """AIMD concurrency limit driven by call latency and failures."""
+
+    def __init__(self, initial: int, minimum: int, maximum: int):
+        self.minimum = minimum
+        self.maximum = maximum
+        self._limit = float(initial)
+        self._latency: float | None = None
+        self._best_latency: float | None = None
+        self._last_decrease = 0.0
+
+    @property
+    def value(self) -> int:
+        return int(self._limit)
+
+    def on_success(self, latency: float):
+        if self._latency is None:
+            self._latency = latency
+        else:
+            self._latency += LATENCY_SMOOTHING * (latency - self._latency)
+        if self._best_latency is None or self._latency < self._best_latency:
+            self._best_latency = self._latency
+
+        if self._latency > LATENCY_BACKOFF_RATIO * self._best_latency:
+            self._decrease(0.75)
+        else:
+            # About +1 per `limit` completions, i.e. one slot per window
+            self._limit = min(self.maximum, self._limit + 1 / self._limit)
+
+    def on_failure(self):
+        self._decrease(0.5)
+
+    def _decrease(self, factor: float):
+        # At most once per latency window, so a burst of failures from one
+        # overloaded moment doesn't collapse the limit to the minimum
+        now = time.monotonic()
+        if self._latency is not None and now - self._last_decrease < self._latency:
+            return
+        self._last_decrease = now
+        self._limit = max(self.minimum, self._limit * factor)
+        logger.debug("Concurrency limit reduced to %d", self.value)
+
+
+async def run_adaptive(fn: Callable, items: list, *, max_concurrency: int | None = None,
+                       min_concurrency: int = 2, timeout: float | None = None,
+                       retries: int | None = None) -> AsyncIterator[WorkResult]:
+    """Run fn(item) for every item, yielding WorkResults as they complete.
+
+    Args:
+        fn: Blocking callable taking one item. Any exception (or exceeding
+            the timeout) counts as a failure and is retried.
+        items: Work items; WorkResult.index is the item's position here.
+        max_concurrency: Upper bound for the adaptive limit (default MAX_CONCURRENCY).
+        min_concurrency: Lower bound for the adaptive limit.
+        timeout: Seconds allowed per attempt (default TIMEOUT).
+        retries: Extra attempts after a failure (default RETRIES).
+    """
+    maximum = max(1, max_concurrency or MAX_CONCURRENCY)
+    limit = ConcurrencyLimit(initial=max(min_concurrency, maximum // 2),
+                             minimum=min(min_concurrency, maximum), maximum=maximum)
+    timeout = TIMEOUT if timeout is None else timeout
+    retries = RETRIES if retries is None else retries
+
+    loop = asyncio.get_running_loop()
+    executor = _get_executor()
+    queue = deque((i, item, 1) for i, item in enumerate(items))
+    running: dict[asyncio.Task, tuple[int, Any, int, float]] = {}
+
+    async def call(item):
+        return await asyncio.wait_for(loop.run_in_executor(executor, fn, item), timeout)
+
+    try:
+        while queue or running:
+            while queue and len(running) < limit.value:
+                index, item, attempt = queue.popleft()
+                task = asyncio.ensure_future(call(item))
+                running[task] = (index, item, attempt, time.monotonic())
+
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index, item, attempt, started = running.pop(task)
+                elapsed = time.monotonic() - started
+                error = task.exception()
+                if error is None:
+                    limit.on_success(elapsed)
+                    yield WorkResult(index, item, value=task.result(), attempts=attempt, elapsed=elapsed)
+                    continue
+
+                limit.on_failure()
+                if isinstance(error, asyncio.TimeoutError):
+                    error = TimeoutError(f"{item} timed out after {timeout:g}s")
+                if attempt <= retries:
+                    logger.info("Retrying %s (attempt %d failed: %s)", item, attempt, error)
+                    queue.append((index, item, attempt + 1))
+                else:
+                    logger.warning("Giving up on %s after %d attempts: %s", item, attempt, error)
+                    yield WorkResult(index, item, error=error, attempts=attempt, elapsed=elapsed)
+    finally:
+        # Consumer stopped early (e.g. client disconnected): stop waiting on what's left
+        for task in running:
+            task.cancel()
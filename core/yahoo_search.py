@@ -0,0 +1,131 @@
+"""Async Yahoo Finance symbol search, the autocomplete's last-resort fallback.
+
+One pooled httpx.AsyncClient (keep-alive connections) serves all lookups.
+Results are cached per (market, query) for YAHOO_SEARCH_TTL seconds
+(default 1 hour) in an LRU of YAHOO_SEARCH_CACHE_SIZE queries (default
+1024). Identical lookups already in flight share one upstream request. A
+caller that gives up, such as a superseded keystroke, doesn't cancel that
+request; it still fills the cache for the next caller.
+
+The endpoint is YAHOO_SEARCH_URL, so a local stub server can stand in for
+Yahoo.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+SEARCH_URL = os.getenv("YAHOO_SEARCH_URL", "https://query2.finance.yahoo.com/v1/finance/search")
+TIMEOUT = float(os.getenv("YAHOO_SEARCH_TIMEOUT", 3))
+TTL = float(os.getenv("YAHOO_SEARCH_TTL", 3600))
+CACHE_SIZE = int(os.getenv("YAHOO_SEARCH_CACHE_SIZE", 1024))
+
+# Quotes requested per lookup, independent of the caller's limit so one cache entry serves any limit
+QUOTES_COUNT = 10
+# Non-US exchange suffixes excluded from US results
+_FOREIGN_SUFFIXES = (".NS", ".BO", ".L", ".HK", ".SS", ".SZ")
+
+_client: httpx.AsyncClient | None = None
+_client_loop: asyncio.AbstractEventLoop | None = None
+_cache: OrderedDict[tuple[str, str], tuple[float, list[dict]]] = OrderedDict()
+_in_flight: dict[tuple[str, str], asyncio.Task] = {}
+
+
+def _get_client() -> httpx.AsyncClient:
+    """Lazy pooled client, recreated if the event loop changed (e.g. across asyncio.run calls)."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client_loop is not loop:
+        _client = httpx.AsyncClient(
+            timeout=TIMEOUT,
+            headers={"User-Agent": "Mozilla/5.0"},
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=10),
+        )
+        _client_loop = loop
+    return _client
+
+
+async def aclose():
+    """Close the pooled client (call at app shutdown)."""
+    global _client, _client_loop
+    if _client is not None:
+        await _client.aclose()
+    _client = None
+    _client_loop = None
+
+
+def _parse_quotes(quotes: list[dict], market: str) -> list[dict]:
+    results = []
+    for q in quotes:
+        sym = q.get("symbol", "")
+        name = q.get("longname") or q.get("shortname") or sym
+
+        if market == "IN":
+            # Only include NSE (.NS) and BSE (.BO) stocks
+            if sym.endswith(".NS") or sym.endswith(".BO"):
+                exchange = "NSE" if sym.endswith(".NS") else "BSE"
+                results.append({"symbol": sym.rsplit(".", 1)[0], "name": f"{name} ({exchange})"})
+        elif not sym.endswith(_FOREIGN_SUFFIXES):
+            # For US market, include symbols without exchange suffix or common US exchanges
+            results.append({"symbol": sym.split(".")[0], "name": name})
+    return results
+
+
+async def _fetch(query: str, market: str) -> list[dict]:
+    r = await _get_client().get(SEARCH_URL, params={"q": query, "quotesCount": QUOTES_COUNT, "newsCount": 0})
+    r.raise_for_status()
+    return _parse_quotes(r.json().get("quotes", []), market)
+
+
+def _cached(key: tuple[str, str]) -> list[dict] | None:
+    entry = _cache.get(key)
+    if entry is None:
+        return None
+    stored_at, results = entry
+    if time.monotonic() - stored_at > TTL:
+        del _cache[key]
+        return None
+    _cache.move_to_end(key)
+    return results
+
+
+async def _fetch_and_cache(key: tuple[str, str]) -> list[dict] | None:
+    """Shared lookup for all callers of a key; None (not cached) if the upstream failed."""
+    try:
+        results = await _fetch(*key)
+    except Exception as e:
+        logger.warning("Yahoo search failed for %r: %s", key[0], e)
+        return None
+    finally:
+        _in_flight.pop(key, None)
+
+    _cache[key] = (time.monotonic(), results)
+    _cache.move_to_end(key)
+    while len(_cache) > CACHE_SIZE:
+        _cache.popitem(last=False)
+    return results
+
+
+async def search(query: str, limit: int = 8, market: str = "IN") -> list[dict]:
+    """Search Yahoo Finance for tickers; [] on any upstream failure (never cached)."""
+    query = query.strip()
+    if not query:
+        return []
+    key = (" ".join(query.lower().split()), market.upper())
+
+    results = _cached(key)
+    if results is None:
+        task = _in_flight.get(key)
+        if task is None:
+            task = _in_flight[key] = asyncio.ensure_future(_fetch_and_cache(key))
+        # Shielded so a cancelled caller doesn't abort the lookup others are waiting on
+        results = await asyncio.shield(task)
+    return (results or [])[:limit]
@@ -0,0 +1,41 @@
+"""core.ticker_directory's parsers for the published exchange listings."""
+
+import json
+
+from core import ticker_directory
+
+
+def sec_listing(*rows):
+    return json.dumps({"fields": ["cik", "name", "ticker", "exchange"], "data": [list(r) for r in rows]})
+
+
+def test_sec_listing_keeps_common_stock_only():
+    text = sec_listing(
+        (1067983, "BERKSHIRE HATHAWAY INC", "BRK-B", "NYSE"),
+        (1000000, "Bruker Corp /DE/", "BRKR", "Nasdaq"),
+        (1000000, "Bruker Corp /DE/", "BRKRP", "Nasdaq"),  # preferred
+        (1871638, "BurTech Acquisition Corp", "BRKHU", "Nasdaq"),  # unit
+        (1900000, "Example Acquisition Corp", "EXMPW", "Nasdaq"),  # warrant
+        (1900001, "Example Holdings Rights", "EXHD", "Nasdaq"),
+        (1900002, "Example Bank", "EXB-PA", "NYSE"),  # preferred, Yahoo spells it differently
+        (1900003, "Over The Counter Co", "OTCX", "OTC"),
+        (1652044, "Alphabet Inc.", "GOOGL", "Nasdaq"),
+    )
+    assert ticker_directory._parse_sec_listing(text) == [
+        ("BRK-B", "BERKSHIRE HATHAWAY INC"),
+        ("BRKR", "Bruker Corp"),
+        ("GOOGL", "Alphabet Inc."),
+    ]
+
+
+def test_nse_listing_keeps_equity_series():
+    text = (
+        "\ufeffSYMBOL,NAME OF COMPANY, SERIES, DATE OF LISTING, PAID UP VALUE, MARKET LOT, ISIN NUMBER, FACE VALUE\n"
+        "TCS,Tata Consultancy Services Limited,EQ,25-AUG-2004,1,1,INE467B01029,1\n"
+        "20MICRONS,20 Microns Limited,BE,06-OCT-2008,5,1,INE144J01027,5\n"
+        "ABCSME,Abc Sme Limited,SM,01-JAN-2020,10,1,INE000A01001,10\n"
+    )
+    assert ticker_directory._parse_nse_listing(text) == [
+        ("20MICRONS", "20 Microns Limited"),
+        ("TCS", "Tata Consultancy Services Limited"),
+    ]
@@ -0,0 +1,154 @@
+"""core.yahoo_search against a local stub server standing in for Yahoo."""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+from core import yahoo_search
+
+
+class StubYahoo(BaseHTTPRequestHandler):
+    """Answers searches like Yahoo's endpoint; queries starting with "fail" get a 500."""
+
+    protocol_version = "HTTP/1.1"  # keep-alive
+    requests: list[tuple[str, int]] = []  # (query, client port)
+    delay = 0.0
+
+    def do_GET(self):
+        query = parse_qs(urlparse(self.path).query)["q"][0]
+        StubYahoo.requests.append((query, self.client_address[1]))
+        time.sleep(StubYahoo.delay)
+        if query.startswith("fail"):
+            self._send(500, b"")
+            return
+        body = json.dumps({"quotes": [
+            {"symbol": f"{query.upper()}.NS", "longname": f"{query.title()} Ltd"},
+            {"symbol": f"{query.upper()}.BO", "shortname": f"{query.title()}"},
+            {"symbol": query.upper(), "longname": f"{query.title()} Inc."},
+        ]}).encode()
+        self._send(200, body)
+
+    def _send(self, status, body):
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StubYahoo)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{server.server_address[1]}/v1/finance/search"
+    server.shutdown()
+
+
+@pytest.fixture(autouse=True)
+def stub(stub_url, monkeypatch):
+    monkeypatch.setattr(yahoo_search, "SEARCH_URL", stub_url)
+    StubYahoo.requests = []
+    StubYahoo.delay = 0.0
+    yahoo_search._cache.clear()
+    yahoo_search._in_flight.clear()
+    return StubYahoo
+
+
+def run(coro):
+    """Run a test coroutine, closing the pooled client on the same event loop."""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await yahoo_search.aclose()
+
+    return asyncio.run(main())
+
+
+def test_parses_results_per_market():
+    async def lookups():
+        return (await yahoo_search.search("infy", market="IN"),
+                await yahoo_search.search("infy", market="US"))
+
+    india, us = run(lookups())
+    assert india == [{"symbol": "INFY", "name": "Infy Ltd (NSE)"}, {"symbol": "INFY", "name": "Infy (BSE)"}]
+    assert us == [{"symbol": "INFY", "name": "Infy Inc."}]
+
+
+def test_concurrent_identical_lookups_share_one_request(stub):
+    stub.delay = 0.2
+
+    async def lookups():
+        return await asyncio.gather(*(yahoo_search.search("tata", market="IN") for _ in range(5)))
+
+    results = run(lookups())
+    assert len(stub.requests) == 1
+    assert all(r == results[0] for r in results)
+
+
+def test_cancelled_caller_still_fills_cache(stub):
+    stub.delay = 0.2
+
+    async def lookups():
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(yahoo_search.search("wipro"), 0.05)
+        await asyncio.sleep(0.4)
+        return await yahoo_search.search("wipro")
+
+    assert run(lookups())
+    assert len(stub.requests) == 1
+
+
+def test_results_cached_until_ttl(stub, monkeypatch):
+    async def lookups():
+        await yahoo_search.search("hdfc")
+        await yahoo_search.search(" HDFC ")  # same normalized key
+        monkeypatch.setattr(yahoo_search, "TTL", 0.0)
+        await asyncio.sleep(0.01)
+        await yahoo_search.search("hdfc")
+
+    run(lookups())
+    assert [q for q, _ in stub.requests] == ["hdfc", "hdfc"]
+
+
+def test_cache_evicts_least_recently_used(stub, monkeypatch):
+    monkeypatch.setattr(yahoo_search, "CACHE_SIZE", 2)
+
+    async def lookups():
+        for query in ("aaa", "bbb", "aaa", "ccc"):  # "bbb" is least recently used when "ccc" arrives
+            await yahoo_search.search(query)
+        await yahoo_search.search("aaa")
+        await yahoo_search.search("bbb")
+
+    run(lookups())
+    assert [q for q, _ in stub.requests] == ["aaa", "bbb", "ccc", "bbb"]
+
+
+def test_keep_alive_connection_reused(stub):
+    async def lookups():
+        for query in ("one", "two", "three"):
+            await yahoo_search.search(query)
+
+    run(lookups())
+    assert len(stub.requests) == 3
+    assert len({port for _, port in stub.requests}) == 1
+
+
+def test_failures_return_empty_and_are_not_cached(stub):
+    async def lookups():
+        first = await yahoo_search.search("failing")
+        second = await yahoo_search.search("failing")
+        return first, second
+
+    assert run(lookups()) == ([], [])
+    assert len(stub.requests) == 2
+    assert not yahoo_search._cache
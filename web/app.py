@@ -2,37 +2,53 @@ from __future__ import annotations
 
 import asyncio
 import json
+import os
 import sys
 from pathlib import Path
 
-from contextlib import asynccontextmanager
+from contextlib import aclosing, asynccontextmanager
+from email.utils import format_datetime, parsedate_to_datetime
+from functools import partial
 
-from fastapi import FastAPI, Request
-from fastapi.responses import HTMLResponse
+from fastapi import FastAPI, Query, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from sse_starlette.sse import EventSourceResponse
 
 # Ensure project root is on path
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from core.analysis import technical_analysis, fundamental_analysis, piotroski_fscore, canslim_analysis
-from core.cache import _last_refresh_boundary
-from core.data_fetcher import fetch_stock_data, fetch_stock_info, fetch_stock_financials
-from core.db import save_snapshot, get_snapshot, list_snapshot_dates, ensure_indexes
-from core.tickers import search_tickers
+from core.analysis_plan import CATEGORIES, FULL, SOURCES, AnalysisPlan, plan, run_category
+from core.db import (save_snapshot, get_snapshot, list_snapshot_dates, ensure_indexes,
+                     get_symbol_metric_history, get_rank_changes, get_rank_trajectory)
+from core import analysis_results, batch_analysis, yahoo_search
+from core.tickers import load_search_indexes, search_tickers
 from core.stock_groups import get_groups, get_group
-from core.group_analysis import _compute_magic_formula_metrics
+from core.group_analysis import symbol_changes
+from core.cache import current_session_date
+from core.precompute import ENABLED as PRECOMPUTE_ENABLED, run_scheduler, session_metric_stream
+from core.ranking import MagicFormulaTable
+from core.screener import technical_screen
+from core.streaming import iterate_concurrently
 
 @asynccontextmanager
 async def lifespan(app):
     await ensure_indexes()
+    await asyncio.to_thread(load_search_indexes)
+    scheduler = asyncio.create_task(run_scheduler()) if PRECOMPUTE_ENABLED else None
     yield
+    if scheduler:
+        scheduler.cancel()
+    await yahoo_search.aclose()
 
 
 app = FastAPI(title="Stock Analyzer", lifespan=lifespan)
 
 TEMPLATE_DIR = Path(__file__).parent / "templates"
 
-MAGIC_FORMULA_BATCH_SIZE = 10
+# Upper bound for the adaptive per-run concurrency (see core.work_queue)
+MAGIC_FORMULA_CONCURRENCY = int(os.getenv("MAGIC_FORMULA_CONCURRENCY", 16))
+# Completed symbols between provisional "partial" rankings
+MAGIC_FORMULA_PARTIAL_EVERY = 10
 
 
 @app.get("/", response_class=HTMLResponse)
@@ -47,61 +63,193 @@ async def analyze_page():
 
 @app.get("/api/search")
 async def search(q: str = "", market: str = "IN"):
-    return await asyncio.to_thread(search_tickers, q, market=market)
+    return await search_tickers(q, market=market)
 
 
-@app.get("/api/analyze/{symbol}")
-async def analyze(symbol: str, market: str = "IN"):
-    symbol = symbol.strip().upper()
+def _analysis_plan(categories: str, sections: str) -> AnalysisPlan:
+    """Parse comma-separated categories/sections query values (ValueError if invalid)."""
+    def split(value):
+        return [v.strip() for v in value.split(",") if v.strip()]
+    return plan(split(categories), split(sections))
+
+
+async def _analysis_events(symbol: str, market: str, session_date: str, analysis: AnalysisPlan = FULL,
+                           finished: list | None = None):
+    """Run the planned analysis, yielding SSE event dicts as sections are produced.
 
-    # Pre-fetch all data sources in parallel so generators hit cache
+    A category that fails for missing data gets an "error" event tagged
+    with the category, and the others carry on. When every category
+    completes, the encoded result is appended to `finished` and cached for
+    the session, unless it was built from stale data or a category failed.
+    """
+    # Pre-fetch the needed data sources in parallel so generators hit cache
     results = await asyncio.gather(
-        asyncio.to_thread(fetch_stock_data, symbol, "1y", market),
-        asyncio.to_thread(fetch_stock_info, symbol, market),
-        asyncio.to_thread(fetch_stock_financials, symbol, market),
+        *(asyncio.to_thread(SOURCES[name].fetch, symbol, market) for name in analysis.sources),
         return_exceptions=True,
     )
 
-    # If stock data fetch failed, no point continuing
-    if isinstance(results[0], Exception):
-        async def error_stream():
+    # If an essential source (price history) failed, no point continuing
+    for name, result in zip(analysis.sources, results):
+        if SOURCES[name].essential and isinstance(result, Exception):
             yield {
                 "event": "error",
-                "data": json.dumps({"message": str(results[0])}),
+                "data": json.dumps({"message": str(result)}),
             }
-        return EventSourceResponse(error_stream())
-
-    async def event_stream():
-        analyses = [
-            ("technical", technical_analysis),
-            ("fundamental", fundamental_analysis),
-            ("piotroski", piotroski_fscore),
-            ("canslim", canslim_analysis),
-        ]
-
-        for category, analysis_fn in analyses:
-            try:
-                sections = await asyncio.to_thread(
-                    lambda fn=analysis_fn: list(fn(symbol, market=market))
-                )
-                for section in sections:
-                    yield {
-                        "event": "section",
-                        "data": json.dumps({"category": category, **section}),
-                    }
-            except ValueError as e:
-                yield {
-                    "event": "error",
-                    "data": json.dumps({"message": str(e)}),
-                }
-                return
+            return
 
+    meta = analysis.freshness(symbol, market)
+    yield {"event": "meta", "data": json.dumps(meta)}
+
+    # The categories run at once; each section is sent as soon as it's ready,
+    # tagged with its category and position so the page can place it
+    generators = {category: partial(run_category, category, symbol, market)
+                  for category in analysis.categories}
+    sections = []
+    errors = {}
+    async for category, index, section in iterate_concurrently(generators):
+        if "error" in section:
+            errors[category] = section["error"]
+            yield {
+                "event": "error",
+                "data": json.dumps({"category": category, "message": section["error"]}),
+            }
+            continue
+        if not analysis.wants(section):
+            continue
+        payload = {"category": category, "index": index, **section}
+        sections.append(payload)
         yield {
-            "event": "done",
-            "data": json.dumps({"status": "complete"}),
+            "event": "section",
+            "data": json.dumps(payload),
         }
 
-    return EventSourceResponse(event_stream())
+    yield {
+        "event": "done",
+        "data": json.dumps({"status": "complete", "stale": meta["stale"]}),
+    }
+
+    order = {category: i for i, category in enumerate(CATEGORIES)}
+    sections.sort(key=lambda s: (order[s["category"]], s["index"]))
+    extra = {"errors": errors} if errors else {}
+    result = analysis_results.build(symbol, market, session_date, meta, sections,
+                                    categories=list(analysis.categories), **extra)
+    if not meta["stale"] and not errors:
+        # Stale inputs are being refreshed, and failures may be transient;
+        # either way the next view should compute afresh
+        analysis_results.put(symbol, market, session_date, result, variant=analysis.key)
+    if finished is not None:
+        finished.append(result)
+
+
+@app.get("/api/analyze/{symbol}")
+async def analyze(symbol: str, market: str = "IN", categories: str = "", sections: str = ""):
+    """Stream the analysis as SSE; categories=/sections= (comma-separated) select a subset."""
+    symbol = symbol.strip().upper()
+    try:
+        analysis = _analysis_plan(categories, sections)
+    except ValueError as e:
+        return {"error": str(e)}
+    session_date = current_session_date(market)
+
+    cached = analysis_results.get(symbol, market, session_date, variant=analysis.key)
+    if cached:
+        async def replay():
+            yield cached.sse
+        return EventSourceResponse(replay())
+
+    return EventSourceResponse(_analysis_events(symbol, market, session_date, analysis))
+
+
+def _not_modified(request: Request, result: analysis_results.AnalysisResult) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or result.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            return result.last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+@app.get("/api/analyze/{symbol}/json")
+async def analyze_json(symbol: str, request: Request, market: str = "IN",
+                       categories: str = "", sections: str = ""):
+    """The complete analysis as one JSON document, with ETag/Last-Modified revalidation."""
+    symbol = symbol.strip().upper()
+    try:
+        analysis = _analysis_plan(categories, sections)
+    except ValueError as e:
+        return {"error": str(e)}
+    session_date = current_session_date(market)
+
+    result = analysis_results.get(symbol, market, session_date, variant=analysis.key)
+    if result is None:
+        finished = []
+        async for event in _analysis_events(symbol, market, session_date, analysis, finished):
+            if event["event"] == "error":
+                data = json.loads(event["data"])
+                if "category" not in data:
+                    return {"error": data["message"]}
+        result = finished[0]
+
+    headers = {
+        "ETag": result.etag,
+        "Last-Modified": format_datetime(result.last_modified, usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+    if _not_modified(request, result):
+        return Response(status_code=304, headers=headers)
+    return Response(result.body, media_type="application/json", headers=headers)
+
+
+@app.post("/api/analyze/batch")
+async def analyze_batch(request: Request):
+    """Analyze a watchlist, streaming one NDJSON record per symbol as it completes.
+
+    Body: {"symbols": [...], "market": "IN", "categories": [...],
+    "include_sections": false}. Each record holds the categories' summary
+    verdicts (and every section with include_sections); the last line is a
+    {"type": "done"} summary.
+    """
+    try:
+        body = await request.json()
+    except ValueError:
+        return {"error": "Request body must be JSON"}
+    if not isinstance(body, dict):
+        return {"error": "Request body must be a JSON object"}
+
+    symbols = body.get("symbols", [])
+    market = body.get("market", "IN")
+    categories = body.get("categories") or []
+    if not isinstance(symbols, list) or not all(isinstance(s, str) for s in symbols):
+        return {"error": "symbols must be a list of ticker strings"}
+    if not isinstance(market, str):
+        return {"error": "market must be a string"}
+    if isinstance(categories, str):
+        categories = [c.strip() for c in categories.split(",") if c.strip()]
+    if not isinstance(categories, list) or not all(isinstance(c, str) for c in categories):
+        return {"error": "categories must be a list of names or a comma-separated string"}
+    symbols = [s.strip().upper() for s in symbols if s.strip()]
+
+    if not symbols:
+        return {"error": "No symbols provided"}
+    if len(symbols) > batch_analysis.MAX_SYMBOLS:
+        return {"error": f"At most {batch_analysis.MAX_SYMBOLS} symbols per batch"}
+    try:
+        analysis = plan(categories)
+    except ValueError as e:
+        return {"error": str(e)}
+
+    async def lines():
+        records = batch_analysis.analyze_batch(symbols, market, analysis,
+                                               include_sections=bool(body.get("include_sections")))
+        async for record in records:
+            yield json.dumps(record) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
 
 
 @app.get("/groups", response_class=HTMLResponse)
@@ -122,14 +270,35 @@ async def group_symbols(group_id: str, market: str = "IN"):
     return {"symbols": group["symbols"]}
 
 
+@app.get("/api/groups/{group_id}/technical-screen")
+async def group_technical_screen(group_id: str, market: str = "IN", sort: str = "score",
+                                 order: str = "desc"):
+    group = get_group(market, group_id)
+    if not group:
+        return {"error": f"Group '{group_id}' not found for market '{market}'"}
+    return await asyncio.to_thread(
+        technical_screen, group["symbols"], market, sort, order.lower() != "asc",
+    )
+
+
 async def _magic_formula_stream(symbols: list[str], market: str = "IN",
-                                group_id: str | None = None):
-    """Process magic formula with parallel batch fetching."""
+                                group_id: str | None = None, partial_top: int = 0):
+    """Process magic formula on an adaptive work queue, reporting in completion order.
+
+    Per-symbol metrics are persisted for the session (core.db), so any basket
+    only computes the symbols no earlier run has seen this session, and
+    symbols whose inputs match their previous session reuse its metrics.
+
+    With partial_top > 0, a provisional top-N ranking over the symbols
+    finished so far is emitted as a "partial" event every
+    MAGIC_FORMULA_PARTIAL_EVERY completions.
+    """
+
+    session_date = current_session_date(market)
 
     # Return cached snapshot from DB if one exists for this session
     # and the symbol list hasn't changed (e.g. user added/removed stocks)
     if group_id:
-        session_date = _last_refresh_boundary(market).strftime("%Y-%m-%d")
         existing = await get_snapshot(group_id, market, session_date)
         if existing and existing.get("rankings") and sorted(existing.get("symbols", [])) == sorted(symbols):
             yield {
@@ -144,77 +313,58 @@ async def _magic_formula_stream(symbols: list[str], market: str = "IN",
             return
 
     total = len(symbols)
-    stock_data = []
-
-    for batch_start in range(0, total, MAGIC_FORMULA_BATCH_SIZE):
-        batch = symbols[batch_start:batch_start + MAGIC_FORMULA_BATCH_SIZE]
-
-        # Fetch all stocks in this batch in parallel
-        batch_results = await asyncio.gather(*[
-            asyncio.to_thread(_compute_magic_formula_metrics, sym, market)
-            for sym in batch
-        ])
-
-        for i, (sym, metrics) in enumerate(zip(batch, batch_results)):
-            status = "ok" if metrics else "skipped"
-            yield {
-                "event": "progress",
+    table = MagicFormulaTable()
+    completed = 0
+
+    def record(index: int, symbol: str, metrics: dict | None, cached: bool = False) -> list[dict]:
+        """Add one finished symbol; return its progress (and any partial ranking) events."""
+        nonlocal completed
+        completed += 1
+        if metrics:
+            table.add(metrics, position=index)
+        events = [{
+            "event": "progress",
+            "data": json.dumps({
+                "type": "progress",
+                "current": completed,
+                "total": total,
+                "symbol": symbol,
+                "status": "ok" if metrics else "skipped",
+                "cached": cached,
+            }),
+        }]
+        if (partial_top > 0 and len(table) and completed < total
+                and completed % MAGIC_FORMULA_PARTIAL_EVERY == 0):
+            events.append({
+                "event": "partial",
                 "data": json.dumps({
-                    "type": "progress",
-                    "current": batch_start + i + 1,
+                    "type": "partial",
+                    "rankings": table.rank(top=partial_top),
+                    "ranked": len(table),
+                    "processed": completed,
                     "total": total,
-                    "symbol": sym,
-                    "status": status,
                 }),
-            }
-            if metrics:
-                stock_data.append(metrics)
-
-    # Rank and produce final result (same logic as magic_formula)
-    if not stock_data:
-        yield {
-            "event": "result",
-            "data": json.dumps({"type": "result", "rankings": []}),
-        }
-    else:
-        stock_data.sort(key=lambda x: x["earnings_yield"], reverse=True)
-        for rank, s in enumerate(stock_data, 1):
-            s["ey_rank"] = rank
-
-        stock_data.sort(key=lambda x: x["roic"], reverse=True)
-        for rank, s in enumerate(stock_data, 1):
-            s["roic_rank"] = rank
-
-        for s in stock_data:
-            s["combined_rank"] = s["ey_rank"] + s["roic_rank"]
-
-        stock_data.sort(key=lambda x: x["combined_rank"])
-
-        rankings = []
-        for rank, s in enumerate(stock_data, 1):
-            rankings.append({
-                "rank": rank,
-                "symbol": s["symbol"],
-                "name": s["name"],
-                "earnings_yield": round(s["earnings_yield"] * 100, 2),
-                "roic": round(s["roic"] * 100, 2),
-                "ey_rank": s["ey_rank"],
-                "roic_rank": s["roic_rank"],
-                "combined_score": s["combined_rank"],
-                "price": round(s["price"], 2) if s["price"] else None,
-                "market_cap": s["market_cap"],
-                "pe": round(s["pe"], 2) if s["pe"] else None,
             })
+        return events
+
+    # Symbols any basket already computed this session come first without fetching;
+    # for the rest, unchanged inputs since the previous session skip re-derivation
+    results = session_metric_stream(symbols, market, session_date,
+                                    max_concurrency=MAGIC_FORMULA_CONCURRENCY)
+    async with aclosing(results):
+        async for index, symbol, metrics, cached in results:
+            for event in record(index, symbol, metrics, cached=cached):
+                yield event
+
+    rankings = table.rank()
+    yield {
+        "event": "result",
+        "data": json.dumps({"type": "result", "rankings": rankings}),
+    }
 
-        yield {
-            "event": "result",
-            "data": json.dumps({"type": "result", "rankings": rankings}),
-        }
-
-        # Auto-save snapshot to MongoDB
-        if group_id:
-            session_date = _last_refresh_boundary(market).strftime("%Y-%m-%d")
-            await save_snapshot(group_id, market, session_date, symbols, rankings)
+    # Auto-save snapshot to the snapshot store
+    if rankings and group_id:
+        await save_snapshot(group_id, market, session_date, symbols, rankings)
 
     yield {
         "event": "done",
@@ -223,13 +373,14 @@ async def _magic_formula_stream(symbols: list[str], market: str = "IN",
 
 
 @app.get("/api/groups/{group_id}/magic-formula")
-async def group_magic_formula(group_id: str, market: str = "IN"):
+async def group_magic_formula(group_id: str, market: str = "IN", partial_top: int = 0):
     group = get_group(market, group_id)
     if not group:
         return {"error": f"Group '{group_id}' not found for market '{market}'"}
 
     return EventSourceResponse(
-        _magic_formula_stream(group["symbols"], market=market, group_id=group_id)
+        _magic_formula_stream(group["symbols"], market=market, group_id=group_id,
+                              partial_top=partial_top)
     )
 
 
@@ -239,15 +390,58 @@ async def custom_magic_formula(request: Request):
     symbols = body.get("symbols", [])
     market = body.get("market", "IN")
     group_id = body.get("group_id")
+    partial_top = int(body.get("partial_top") or 0)
 
     if not symbols:
         return {"error": "No symbols provided"}
 
     return EventSourceResponse(
-        _magic_formula_stream(symbols, market=market, group_id=group_id)
+        _magic_formula_stream(symbols, market=market, group_id=group_id, partial_top=partial_top)
     )
 
 
+@app.get("/api/groups/{group_id}/rank-changes")
+async def group_rank_changes(group_id: str, market: str = "IN",
+                             from_date: str = Query("", alias="from"),
+                             to_date: str = Query("", alias="to")):
+    """Rank changes between two snapshot dates (default: the two most recent)."""
+    if not from_date or not to_date:
+        dates = await list_snapshot_dates(group_id, market)
+        to_date = to_date or (dates[0] if dates else "")
+        earlier = [d for d in dates if d < to_date]
+        from_date = from_date or (earlier[0] if earlier else "")
+    if not from_date or not to_date:
+        return {"error": "Need two snapshots to compare"}
+    changes = await get_rank_changes(group_id, market, from_date, to_date)
+    return {"from": from_date, "to": to_date, "changes": changes}
+
+
+@app.get("/api/groups/{group_id}/trajectory")
+async def group_rank_trajectory(group_id: str, market: str = "IN", symbol: str = ""):
+    """A symbol's rank in every snapshot of the group, oldest first."""
+    if not symbol:
+        return {"error": "symbol query parameter is required"}
+    symbol = symbol.strip().upper()
+    points = await get_rank_trajectory(group_id, market, symbol)
+    return {"symbol": symbol, "points": points}
+
+
+@app.get("/api/groups/{group_id}/changes")
+async def group_changes(group_id: str, market: str = "IN", date: str = ""):
+    """Per-symbol report of what changed between each symbol's two latest computed sessions."""
+    group = get_group(market, group_id)
+    if not group:
+        return {"error": f"Group '{group_id}' not found for market '{market}'"}
+    until = date or current_session_date(market)
+    history = await get_symbol_metric_history(market, group["symbols"], until=until)
+    rows = symbol_changes(group["symbols"], history)
+    return {
+        "until": until,
+        "changed": sum(r["status"] == "changed" for r in rows),
+        "rows": rows,
+    }
+
+
 @app.get("/api/groups/{group_id}/history")
 async def group_history(group_id: str, market: str = "IN"):
     dates = await list_snapshot_dates(group_id, market)